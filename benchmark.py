@@ -0,0 +1,199 @@
+import contextlib
+import json
+import os
+import resource
+import tempfile
+import time
+import multiprocessing as mp
+from pathlib import Path
+import fire
+import numpy as np
+import pandas as pd
+import utils
+import trace_store
+from main import run_optimizer
+from profile_catalog import get_catalog
+
+OPTIMIZERS = ["perf_opt", "carbon_opt", "oracle", "eco-life"]
+SCALES = [10, 100, 1000]
+BASELINE = Path(__file__).parents[0] / "results" / "benchmark" / "baseline.json"
+# metrics compared against the baseline: (column, higher is better)
+CHECKS = [("minutes_per_s", True), ("peak_rss_mb", False)]
+
+
+def synthetic_traces(functions, minutes, rate=0.5, spread=1.0, burstiness=0.0, period=0, amplitude=0.5,
+                     server_pair=['i3','m5zn'], seed=0):
+    '''
+    (functions x minutes) invocation counts shaped as the selected traces:
+    - rate: median invocations per minute of a function, the rates of the
+      functions are lognormal with sigma spread
+    - burstiness: variance of a gamma factor of every minute (0: poisson)
+    - period/amplitude: sinusoidal load of period minutes, a random phase per
+      function (period 0: flat)
+    Functions are the profiled apps (on every server of server_pair) in turn.
+    returns traces, function names, original function names
+    '''
+    rng = np.random.default_rng(seed)
+    catalog = get_catalog()
+    apps = [app for app in catalog.apps if all((app, server) in catalog._profiles for server in server_pair)]
+    names = [apps[i % len(apps)] for i in range(functions)]
+    lam = rate*rng.lognormal(0.0, spread, size=(functions, 1))*np.ones((1, minutes))
+    if period:
+        phase = rng.uniform(0, 2*np.pi, size=(functions, 1))
+        lam = lam*(1+amplitude*np.sin(2*np.pi*np.arange(minutes)/period+phase))
+    if burstiness > 0:
+        lam = lam*rng.gamma(1/burstiness, burstiness, size=lam.shape)
+    counts = rng.poisson(np.clip(lam, 0, None))
+    traces = np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+    return traces, names, [f"{name}*synthetic-{i}" for i, name in enumerate(names)]
+
+
+def write_traces(directory, traces, function_names, original_function_names):
+    #the converted trace store layout, read back with trace_store.load_traces
+    os.makedirs(directory, exist_ok=True)
+    npy_path, index_path = f"{directory}/selected_trace.npy", f"{directory}/selected_trace_index.json"
+    np.save(npy_path, traces)
+    with open(index_path, "w") as file:
+        json.dump({"original_function_names": original_function_names, "function_names": function_names}, file, indent=4)
+    return npy_path, index_path
+
+
+def _rss_mb():
+    #peak resident memory of this process (ru_maxrss is in KB on linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+def run_case(case):
+    '''
+    one optimizer over one synthetic trace, in a fresh process so that the
+    peak memory is its own: simulated minutes per second, peak memory and,
+    for eco-life, the time of its phases
+    '''
+    npy_path, index_path = case["trace"]
+    traces, trace_function_names, _ = trace_store.load_traces(npy_path, index_path, source=None)
+    function_mem_trace = [utils.read_func_mem_size(name) for name in trace_function_names]
+    carbon_intensity, ci_max, _, ci_avg = utils.load_carbon_intensity(case["region"], case["start_hour"], case["window_size"]+case["minutes"])
+    start_rss = _rss_mb()
+    with tempfile.TemporaryDirectory() as result_dir:
+        profile_out = f"{result_dir}/profile"
+        eco_life = case["optimizer"] == "eco-life"
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_optimizer(case["optimizer"], traces, trace_function_names, function_mem_trace, carbon_intensity, ci_max, ci_avg,
+                          case["region"], case["minutes"], case["mem_old"], case["mem_new"], case["server_pair"],
+                          [i for i in range(0,31)], case["STlambda"], case["window_size"], case["pso_size"],
+                          result_dir=f"{result_dir}/results", packer=case["packer"], profile=eco_life,
+                          profile_out=profile_out if eco_life else None)
+        wall = time.perf_counter()-start
+        phases = {}
+        if eco_life:
+            with open(f"{profile_out}.json") as file:
+                phases = {row["phase"]: row["total_s"] for row in json.load(file)["phases"] if ";" not in row["phase"]}
+    return {"optimizer": case["optimizer"], "functions": case["functions"], "minutes": case["minutes"],
+            "invocations": int(np.asarray(traces[:, case["window_size"]:]).sum()), "wall_s": wall,
+            "minutes_per_s": case["minutes"]/wall, "start_rss_mb": start_rss, "peak_rss_mb": _rss_mb(), "phases": phases}
+
+
+def compare(rows, baseline, tolerance):
+    '''
+    the metrics of rows worse than the baseline rows (same optimizer and
+    number of functions) by more than tolerance
+    '''
+    previous = {(row["optimizer"], row["functions"]): row for row in baseline}
+    regressions = []
+    for row in rows:
+        old = previous.get((row["optimizer"], row["functions"]))
+        if old is None:
+            continue
+        for column, higher in CHECKS:
+            change = row[column]/old[column]-1 if old[column] else 0.0
+            if (change < -tolerance) if higher else (change > tolerance):
+                regressions.append({"optimizer": row["optimizer"], "functions": row["functions"], "metric": column,
+                                    "baseline": old[column], "value": row[column], "change": change})
+    return regressions
+
+
+def benchmark(
+    scales: list = SCALES,
+    optimizers: list = OPTIMIZERS,
+    minutes: int = 60,
+    window_size: int = 20,
+    rate: float = 0.5,
+    spread: float = 1.0,
+    burstiness: float = 0.0,
+    period: int = 0,
+    amplitude: float = 0.5,
+    region: str = "US-CAL",
+    start_hour: int = 800,
+    server_pair: list = ['i3','m5zn'],
+    mem_old: float = 512,
+    mem_new: float = 512,
+    STlambda: float = 0.5,
+    pso_size: int = 15,
+    packer: str = "greedy",
+    seed: int = 0,
+    repeat: int = 1,
+    out_dir: str = None,
+    baseline: str = str(BASELINE),
+    update: bool = False,
+    tolerance: float = 0.2,
+):
+    '''
+    simulator throughput of the optimizers over synthetic traces of scales
+    functions (10 to 100k): each (scale, optimizer) runs in its own process
+    over minutes simulated minutes, the fastest of repeat runs is kept.
+    Writes <out_dir>/benchmark.csv and benchmark.json; with update the
+    results become the baseline, otherwise they are compared with it and the
+    regressions beyond tolerance are reported (exit status 1)
+    '''
+    out_dir = f"{Path(__file__).parents[0]}/results/benchmark" if out_dir is None else out_dir
+    scales = [int(scale) for scale in (scales if isinstance(scales, (list, tuple)) else [scales])]
+    optimizers = list(optimizers) if isinstance(optimizers, (list, tuple)) else optimizers.split(",")
+    for optimizer in optimizers:
+        if optimizer not in OPTIMIZERS:
+            raise ValueError(f"unknown optimizer {optimizer}, choose from {OPTIMIZERS}")
+    rows = []
+    with tempfile.TemporaryDirectory() as trace_dir:
+        for scale in scales:
+            traces = synthetic_traces(scale, window_size+minutes, rate, spread, burstiness, period, amplitude, list(server_pair), seed)
+            paths = write_traces(f"{trace_dir}/{scale}", *traces)
+            for optimizer in optimizers:
+                case = {"optimizer": optimizer, "functions": scale, "trace": paths, "minutes": minutes, "window_size": window_size,
+                        "region": region, "start_hour": start_hour, "server_pair": list(server_pair), "mem_old": mem_old,
+                        "mem_new": mem_new, "STlambda": STlambda, "pso_size": pso_size, "packer": packer}
+                runs = []
+                for _ in range(repeat):
+                    with mp.get_context("spawn").Pool(1) as pool:
+                        runs.append(pool.apply(run_case, (case,)))
+                row = min(runs, key=lambda run: run["wall_s"])
+                print(f"{optimizer} x {scale} functions: {row['minutes_per_s']:.2f} minutes/s, peak rss {row['peak_rss_mb']:.0f} MB")
+                rows.append(row)
+
+    table = pd.DataFrame([{key: value for key, value in row.items() if key != "phases"} for row in rows])
+    phases = pd.DataFrame([{"optimizer": row["optimizer"], "functions": row["functions"], **row["phases"]} for row in rows if row["phases"]])
+    os.makedirs(out_dir, exist_ok=True)
+    table.to_csv(f"{out_dir}/benchmark.csv", index=False)
+    with open(f"{out_dir}/benchmark.json", "w") as file:
+        json.dump(rows, file, indent=4)
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if len(phases):
+        print("eco-life phases (s):")
+        print(phases.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+
+    if update or not Path(baseline).exists():
+        os.makedirs(Path(baseline).parent, exist_ok=True)
+        with open(baseline, "w") as file:
+            json.dump(rows, file, indent=4)
+        print(f"baseline written to {baseline}")
+        return
+    with open(baseline) as file:
+        regressions = compare(rows, json.load(file), tolerance)
+    if regressions:
+        print("regressions against the baseline:")
+        print(pd.DataFrame(regressions).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        raise SystemExit(1)
+    print(f"no regression beyond {tolerance:.0%} of {baseline}")
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
@@ -0,0 +1,113 @@
+import numpy as np
+from profile_catalog import get_catalog
+
+# lifetime of a server (4 years) used to amortize the embodied carbon
+LIFETIME_S = 4*12*30*24*3600
+LIFETIME_MIN = 4*12*30*24*60
+
+
+class CarbonModel:
+    '''
+    Closed-form version of utils.compute_exe / utils.compute_kat.
+    Both are linear in CI (and kat), so the per-(app, server) coefficients are
+    computed once and whole CI series / kat grids are evaluated with NumPy.
+    The expressions keep the operation order of utils, so an entry of the
+    tensors is bit-identical to the scalar helper.
+    '''
+    def __init__(self, apps=None, servers=None, catalog=None):
+        catalog = get_catalog() if catalog is None else catalog
+        self.apps = list(catalog.apps if apps is None else apps)
+        self.servers = list(catalog.servers if servers is None else servers)
+        self.app_index = {name: i for i, name in enumerate(self.apps)}
+        self.server_index = {name: i for i, name in enumerate(self.servers)}
+        a = catalog.app_indices(self.apps)
+        s = catalog.server_indices(self.servers)
+        prof = {field: value[np.ix_(a, s)] for field, value in catalog.profile.items()}
+        server = {field: value[s][None, :] for field, value in catalog.server.items()}
+        q = catalog.app_mem[a][:, None] / server['mem']
+
+        #service time (apps x servers)
+        self.cold_st = prof['cs'] + prof['exe']
+        self.warm_st = prof['exe']
+
+        #operational coefficients, energy of cpu and dram (dram scaled by q)
+        self.cold_cpu = prof['cs_energy_cpu'] + prof['exe_energy_cpu']
+        self.cold_dram = (prof['cs_energy_dram'] + prof['exe_energy_dram'])*q
+        self.warm_cpu = prof['exe_energy_cpu']
+        self.warm_dram = prof['exe_energy_dram']*q
+
+        #embodied constants
+        self.cold_ec = (self.cold_st/LIFETIME_S)*server['ec_cpu']*1000 + (self.cold_st/LIFETIME_S)*q*server['ec_ram']*1000
+        self.warm_ec = (self.warm_st/LIFETIME_S)*server['ec_cpu']*1000 + (self.warm_st/LIFETIME_S)*q*server['ec_ram']*1000
+
+        #keep alive coefficients
+        self.q = q
+        self.inv_core = 1/server['core']
+        self.ec_cpu = server['ec_cpu']
+        self.ec_ram = server['ec_ram']
+        self.cpu_idle = server['cpu_idle_energy']
+        self.dram_idle = server['dram_idle_energy']
+
+    #slope per gCO2/kWh and embodied constant of the linear model
+    @property
+    def cold_slope(self):
+        return (self.cold_cpu + self.cold_dram)/1000/3600
+
+    @property
+    def warm_slope(self):
+        return (self.warm_cpu + self.warm_dram)/1000/3600
+
+    @property
+    def kat_slope(self):
+        #per minute of keep alive
+        return (self.q*self.dram_idle + self.inv_core*self.cpu_idle)/1000/3600/10
+
+    @property
+    def kat_embodied(self):
+        #per minute of keep alive
+        return (1000/LIFETIME_MIN)*(self.q*self.ec_ram + self.inv_core*self.ec_cpu)
+
+    def exe(self, ci):
+        '''
+        cold/warm execution carbon, both (apps x servers x time)
+        '''
+        ci = np.atleast_1d(np.asarray(ci, dtype=float))[None, None, :]
+        cold_oc = (self.cold_cpu[..., None]*ci)/1000/3600 + (self.cold_dram[..., None]*ci)/1000/3600
+        warm_oc = (self.warm_cpu[..., None]*ci)/1000/3600 + (self.warm_dram[..., None]*ci)/1000/3600
+        return cold_oc + self.cold_ec[..., None], warm_oc + self.warm_ec[..., None]
+
+    def keepalive(self, kat, ci):
+        '''
+        keep alive carbon (apps x servers x kat x time), kat in minutes
+        '''
+        kat = np.atleast_1d(np.asarray(kat))[None, None, :, None]
+        ci = np.atleast_1d(np.asarray(ci, dtype=float))[None, None, None, :]
+        return self._keepalive(kat, ci, lambda x: x[..., None, None])
+
+    def keepalive_pairs(self, kat, ci):
+        '''
+        keep alive carbon (apps x servers x n) for n matching (kat, ci) pairs
+        '''
+        kat = np.atleast_1d(np.asarray(kat))[None, None, :]
+        ci = np.atleast_1d(np.asarray(ci, dtype=float))[None, None, :]
+        return self._keepalive(kat, ci, lambda x: x[..., None])
+
+    def _keepalive(self, kat, ci, expand):
+        q = expand(self.q)
+        inv_core = expand(self.inv_core)
+        ec_kat_dram = (kat*1000/LIFETIME_MIN)*q*expand(self.ec_ram)
+        oc_kat_dram = kat*q*ci*expand(self.dram_idle)/1000/3600/10
+        ec_kat_cpu = (kat*1000/LIFETIME_MIN)*inv_core*expand(self.ec_cpu)
+        oc_kat_cpu = kat*inv_core*ci*expand(self.cpu_idle)/1000/3600/10
+        return ec_kat_cpu+ec_kat_dram+oc_kat_cpu+oc_kat_dram
+
+
+_models = {}
+
+
+def get_carbon_model(apps=None, servers=None):
+    #one model per (apps, servers) selection
+    key = (None if apps is None else tuple(apps), None if servers is None else tuple(servers))
+    if key not in _models:
+        _models[key] = CarbonModel(apps, servers)
+    return _models[key]
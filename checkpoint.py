@@ -0,0 +1,55 @@
+import glob
+import os
+import pickle
+import random
+import re
+import numpy as np
+
+PATTERN = "checkpoint-{minute:07d}.pkl"
+
+
+def rng_state():
+    return {"random": random.getstate(), "numpy": np.random.get_state()}
+
+
+def set_rng_state(state):
+    random.setstate(state["random"])
+    np.random.set_state(state["numpy"])
+
+
+def save(checkpoint_dir, minute, state, keep=2):
+    '''
+    write the state after minute to checkpoint_dir (atomically, a crash while
+    writing leaves the previous checkpoint), only the last keep are kept
+    '''
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = f"{checkpoint_dir}/{PATTERN.format(minute=minute)}"
+    with open(f"{path}.tmp", "wb") as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+    for old in checkpoints(checkpoint_dir)[:-keep]:
+        os.remove(old)
+    return path
+
+
+def checkpoints(checkpoint_dir):
+    #checkpoint files, oldest first
+    paths = glob.glob(f"{checkpoint_dir}/checkpoint-*.pkl")
+    return sorted(paths, key=lambda path: int(re.findall(r"checkpoint-(\d+)\.pkl$", path)[0]))
+
+
+def latest(checkpoint_dir):
+    paths = checkpoints(checkpoint_dir)
+    return paths[-1] if paths else None
+
+
+def load(path):
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def clear(checkpoint_dir):
+    for path in checkpoints(checkpoint_dir):
+        os.remove(path)
+    if os.path.isdir(checkpoint_dir) and not os.listdir(checkpoint_dir):
+        os.rmdir(checkpoint_dir)
@@ -0,0 +1,78 @@
+from pathlib import Path
+from glob import glob
+import math
+import os
+import numpy as np
+import pandas as pd
+import fire
+
+CI_DIR = Path(__file__).parents[0] / "carbon_intensity"
+CI_COLUMN = "Carbon Intensity gCO₂eq/kWh (direct)"
+
+
+class RegionCI:
+    '''
+    Hourly carbon intensity of a region with its yearly max/min/avg.
+    The csv is parsed once into a binary cache (<csv>.npz next to it),
+    rebuilt when the csv is newer.
+    '''
+    def __init__(self, region, root=CI_DIR):
+        files = glob(f"{root}/{region}*_2023_hourly.csv")
+        if not files:
+            raise ValueError(f"no carbon intensity file for region {region}")
+        csv = files[0]
+        cache = csv[:-len(".csv")] + ".npz"
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(csv):
+            with np.load(cache) as data:
+                self.hourly = data["hourly"]
+                self.ci_max, self.ci_min, self.ci_avg = (float(x) for x in data["stats"])
+        else:
+            column = pd.read_csv(csv)[CI_COLUMN]
+            self.hourly = column.values.astype(float)
+            self.ci_max, self.ci_min, self.ci_avg = float(column.max()), float(column.min()), float(column.mean())
+            try:
+                np.savez(cache, hourly=self.hourly, stats=np.array([self.ci_max, self.ci_min, self.ci_avg]))
+            except OSError:
+                #read only checkout, keep it in memory
+                pass
+        self.region = region
+
+    def _hours(self, start_hour, minutes):
+        hours = math.ceil(minutes/60)
+        if start_hour < 0 or start_hour+hours > len(self.hourly):
+            raise ValueError(f"{self.region} has {len(self.hourly)} hours of carbon intensity, hours {start_hour}-{start_hour+hours} were requested")
+        return self.hourly[start_hour:start_hour+hours]
+
+    def minutes(self, start_hour, minutes):
+        #per minute carbon intensity of the minutes [0, minutes) starting at start_hour
+        return np.repeat(self._hours(start_hour, minutes), 60)[:minutes]
+
+
+_regions = {}
+
+
+def get_region(region):
+    #one parsed region per process
+    if region not in _regions:
+        _regions[region] = RegionCI(region)
+    return _regions[region]
+
+
+def load(region="US-CAL", start_hour=800, minutes=12*24*60):
+    '''
+    per minute carbon intensity and yearly max, min, avg of region
+    '''
+    data = get_region(region)
+    return data.minutes(start_hour, minutes), data.ci_max, data.ci_min, data.ci_avg
+
+
+def convert(root=CI_DIR):
+    #build the binary cache of every region
+    for csv in sorted(glob(f"{root}/*_2023_hourly.csv")):
+        region = os.path.basename(csv).split("_")[0]
+        RegionCI(region, root)
+        print(f"cached {region}")
+
+
+if __name__ == "__main__":
+    fire.Fire(convert)
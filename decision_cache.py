@@ -0,0 +1,61 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class LRUCache:
+    '''
+    Bounded mapping, the least recently used entry is evicted first.
+    Counts hits, misses and evictions.
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits/lookups if lookups else 0.0
+
+    def stats(self):
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate}
+
+
+def ci_bucket(ci, step):
+    #quantized ci, exact when step is 0
+    return float(ci) if step == 0 else int(np.floor(ci/step))
+
+
+def keys(functions, ci, cold, n_interval, kat_ci=None, ci_step=0):
+    '''
+    one key per function: function id, ci bucket, expected keep alive ci
+    (forecast) and the interval signature (cumulative cold histogram and
+    number of intervals of its window)
+    '''
+    bucket = ci_bucket(ci, ci_step)
+    kat_key = None if kat_ci is None else tuple(ci_bucket(x, ci_step) for x in np.asarray(kat_ci).tolist())
+    return [(int(f), bucket, kat_key, cold[n].tobytes(), int(n_interval[n])) for n, f in enumerate(functions)]
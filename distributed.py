@@ -0,0 +1,267 @@
+import heapq
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+import random
+import numpy as np
+import fire
+import utils
+import packer
+import result_store
+from metrics import Metrics
+from optimizers import tech
+
+AUTHKEY = b"eco-life"
+MODES = ("bsp", "budget")
+
+
+def parse_address(address):
+    #"host:port" or (host, port)
+    if isinstance(address, str):
+        host, port = address.rsplit(":", 1)
+        return host, int(port)
+    return tuple(address)
+
+
+def shard_functions(traces, shards, start, end):
+    '''
+    functions of every shard, balanced on their invocations in [start, end)
+    (longest first, to the least loaded shard)
+    '''
+    load = np.asarray(traces[:, start:end]).sum(axis=1)
+    parts = [[] for _ in range(shards)]
+    loads = np.zeros(shards)
+    for f in np.argsort(-load, kind="stable"):
+        k = int(np.argmin(loads))
+        parts[k].append(int(f))
+        loads[k] += load[f]
+    return [sorted(part) for part in parts]
+
+
+def load_shard(config, functions):
+    #the eco-life optimizer of the functions of one shard
+    carbon_intensity, ci_max, _, ci_avg = utils.load_carbon_intensity(config["region"], config["start_hour"], config["window_size"]+config["interval"])
+    traces, trace_function_names, _ = utils.read_selected_traces()
+    traces = traces[functions]
+    names = [trace_function_names[f] for f in functions]
+    function_mem_trace = [utils.read_func_mem_size(name) for name in names]
+    forecaster = None if config["forecast"] is None else utils.make_forecaster(config["forecast"], config["region"], config["start_hour"])
+    return tech.tech(traces, names, config["server_pair"], config["kat_time"], config["STlambda"], carbon_intensity,
+                     config["window_size"], None, None, ci_max, function_mem_trace, config["pso_size"], config["region"],
+                     config["interval"], None, forecaster, config["cache_size"], config["cache_ci_step"],
+                     config["cache_decisions"], config["packer"], config["mem_limits"], start_hour=config["start_hour"])
+
+
+class RemotePacker:
+    '''
+    packer.Packer of a shard in bsp mode: the memory checks and the packings
+    of the warm pools are made by the coordinator over all shards
+    '''
+    def __init__(self, conn):
+        self.conn = conn
+        self.calls = 0
+
+    def fits(self, capacity, cost):
+        self.conn.send(("fits", capacity, np.asarray(cost)))
+        return self.conn.recv()
+
+    def pack(self, capacity, sizes, quantities, values, order):
+        self.calls += 1
+        self.conn.send(("pack", capacity, np.asarray(sizes, dtype=float), np.asarray(quantities, dtype=np.int64),
+                        np.asarray(values, dtype=float), np.asarray(order, dtype=np.int64)))
+        return self.conn.recv()
+
+
+def worker(address, shard):
+    '''
+    run one shard: the coordinator at address sends the configuration and
+    the functions, then (bsp) steps the shard minute by minute
+    '''
+    conn = Client(parse_address(address), authkey=AUTHKEY)
+    conn.send(("hello", shard))
+    config, functions = conn.recv()
+    #forked shards would share the random state of the coordinator
+    seed = None if config["seed"] is None else config["seed"]+shard
+    random.seed(seed)
+    np.random.seed(seed)
+    optimizer = load_shard(config, functions)
+    if config["mode"] == "budget":
+        #the shard keeps its share of the memory of every server
+        optimizer.mem_limits = [mem*config["shares"][shard] for mem in optimizer.mem_limits]
+        optimizer.start()
+        for j, invoked in optimizer.events:
+            optimizer.place(j, optimizer.execute(j, invoked))
+    else:
+        optimizer.start(RemotePacker(conn))
+        while True:
+            conn.send(("next", optimizer.events.next_minute()))
+            message = conn.recv()
+            if message[0] == "stop":
+                break
+            j = message[1]
+            sum_discard = optimizer.place(j, optimizer.execute(j, optimizer.events.take(j)))
+            conn.send(("done", optimizer.sum_st, optimizer.sum_carbon, optimizer.sum1, sum_discard))
+    #rows of the global function ids
+    rows = [(functions[row[0]],) + row[1:] for row in optimizer.rows()]
+    conn.send(("result", rows, optimizer.sum_st, optimizer.sum_carbon, optimizer.sum1))
+    conn.close()
+
+
+def _gather(conns):
+    #one message of every shard, all of the same kind
+    messages = [conn.recv() for conn in conns]
+    assert all(message[0] == messages[0][0] for message in messages), "shards out of step"
+    return messages[0][0], messages
+
+
+def _reply(conns, replies):
+    for conn, reply in zip(conns, replies):
+        conn.send(reply)
+
+
+def reconcile(conns, tag, messages, pool_packer):
+    '''
+    answer a memory check (the costs of the shards are summed) or a packing
+    (the candidates of the shards are packed together; each shard keeps its
+    own order and the shards are merged by decreasing value per GB)
+    '''
+    if tag == "fits":
+        cost = np.sum([message[2] for message in messages], axis=0)
+        _reply(conns, [pool_packer.fits(messages[0][1], cost)]*len(conns))
+    elif tag == "pack":
+        capacity = messages[0][1]
+        sizes = np.concatenate([message[2] for message in messages])
+        quantities = np.concatenate([message[3] for message in messages])
+        values = np.concatenate([message[4] for message in messages])
+        offsets = np.cumsum([0]+[len(message[2]) for message in messages])
+        density = values/np.where(sizes > 0, sizes, np.finfo(float).tiny)
+        runs = [(offset+message[5]).tolist() for offset, message in zip(offsets, messages)]
+        order = list(heapq.merge(*runs, key=lambda index: -density[index]))
+        counts = pool_packer.pack(capacity, sizes, quantities, values, order)
+        _reply(conns, [counts[offsets[k]:offsets[k+1]] for k in range(len(conns))])
+    else:
+        raise ValueError(f"unknown message {tag}")
+
+
+def coordinate(listener, config, parts, function_num, result_dir, metrics=None):
+    '''
+    accept the shards, step them (bsp) and write the merged results;
+    metrics (a metrics.Metrics) records the progress of the bsp minutes
+    '''
+    metrics = metrics if metrics is not None else Metrics(config["interval"], "minute")
+    discards = 0
+    conns = [None]*len(parts)
+    for _ in parts:
+        conn = listener.accept()
+        _, shard = conn.recv()
+        conns[shard] = conn
+    for conn, part in zip(conns, parts):
+        conn.send((config, part))
+    pool_packer = packer.Packer(config["packer"])
+    while config["mode"] == "bsp":
+        _, messages = _gather(conns)
+        minutes = [message[1] for message in messages if message[1] is not None]
+        if not minutes:
+            _reply(conns, [("stop",)]*len(conns))
+            break
+        j = min(minutes)
+        _reply(conns, [("step", j)]*len(conns))
+        tag, messages = _gather(conns)
+        while tag != "done":
+            reconcile(conns, tag, messages, pool_packer)
+            tag, messages = _gather(conns)
+        sum_st, sum_carbon, sum1 = (sum(message[k] for message in messages) for k in (1, 2, 3))
+        discards += sum(message[4] for message in messages)
+        metrics.emit(j-config["window_size"]+1, {"minute": j, "invocations": sum1, "st": sum_st/sum1 if sum1 else 0.0,
+                                                  "carbon": sum_carbon/sum1 if sum1 else 0.0, "discards": int(discards)})
+    metrics.close(config["interval"])
+    _, messages = _gather(conns)
+    for conn in conns:
+        conn.close()
+    rows = {}
+    for message in messages:
+        for row in message[1]:
+            rows[row[0]] = row
+    sum_st, sum_carbon, sum1 = (sum(message[k] for message in messages) for k in (2, 3, 4))
+    print(f"service time is:{sum_st/sum1}, carbon is: {sum_carbon/sum1}")
+    if pool_packer.calls:
+        print(f"packer: {pool_packer.stats()}")
+    with result_store.ResultWriter(result_dir, function_num, per_invocation=False) as writer:
+        for i in range(function_num):
+            if i in rows:
+                writer.append(*rows[i])
+    return result_dir
+
+
+def run(
+    shards: int=2,
+    mode: str="bsp",
+    listen: str="localhost:0",
+    local: bool=True,
+    region: str="US-CAL",
+    start_hour: int=800,
+    interval: int=12*24*60,
+    mem_old: int = 512,
+    mem_new: int = 512,
+    mem_limits: list = None,
+    server_pair: list = ['i3','m5zn'],
+    kat_time: list = [i for i in range(0,31)],
+    STlambda: float = 0.5,
+    window_size: int = 20,
+    pso_size: int = 15,
+    forecast: str = None,
+    cache_size: int = 0,
+    cache_ci_step: float = 1.0,
+    cache_decisions: bool = True,
+    packer: str = "greedy",
+    seed: int = None,
+    result_dir: str = None,
+    metrics_every: int = 60,
+    metrics_out: str = None,
+    quiet: bool = False,
+    progress: bool = False,
+):
+    '''
+    eco-life with the functions partitioned over shards. Each shard runs the
+    swarms and execution decisions of its functions; the warm pools are
+    reconciled by this coordinator:
+    - bsp: bulk-synchronous, every event minute the memory checks and the
+      pool packings are made over all shards with the global memory limits
+    - budget: each shard gets a share of every memory limit (its share of the
+      memory demand) and runs on its own
+    With local the shards are processes of this host, otherwise start
+    `python distributed.py worker --address=<listen> --shard=<k>` on each node.
+    The progress is recorded every metrics_every minutes (see main).
+    '''
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode}, choose from {list(MODES)}")
+    traces, trace_function_names, _ = utils.read_selected_traces()
+    function_mem_trace = np.array([utils.read_func_mem_size(name) for name in trace_function_names])
+    parts = shard_functions(traces, shards, window_size, window_size+interval)
+    demand = function_mem_trace*np.asarray(traces[:, window_size:window_size+interval]).sum(axis=1)
+    shares = [float(demand[part].sum()/demand.sum()) if demand.sum() else 1/shards for part in parts]
+    mem_limits = list(mem_limits) if mem_limits is not None else [mem_old]+[mem_new]*(len(server_pair)-1)
+    config = {"mode": mode, "region": region, "start_hour": start_hour, "interval": interval, "mem_limits": mem_limits,
+              "server_pair": list(server_pair), "kat_time": list(kat_time), "STlambda": STlambda, "window_size": window_size,
+              "pso_size": pso_size, "forecast": forecast, "cache_size": cache_size, "cache_ci_step": cache_ci_step,
+              "cache_decisions": cache_decisions, "packer": packer, "seed": seed, "shares": shares}
+    result_dir = result_dir if result_dir is not None else f"{Path(__file__).parents[0]}/results/eco_life"
+    with Listener(parse_address(listen), authkey=AUTHKEY) as listener:
+        print(f"coordinator at {listener.address[0]}:{listener.address[1]}, {shards} shards ({mode})")
+        processes = []
+        if local:
+            context = mp.get_context("fork")
+            processes = [context.Process(target=worker, args=(listener.address, shard)) for shard in range(shards)]
+            for process in processes:
+                process.start()
+        try:
+            coordinate(listener, config, parts, len(traces), result_dir,
+                       Metrics(interval, "minute", metrics_out, every=metrics_every, quiet=quiet, progress=progress))
+        finally:
+            for process in processes:
+                process.join()
+    return result_dir
+
+
+if __name__ == "__main__":
+    fire.Fire({"run": run, "worker": worker})
@@ -0,0 +1,80 @@
+import heapq
+import numpy as np
+
+
+def invocation_minutes(trace, start, end):
+    #minutes in [start, end) where the function is invoked
+    return (np.flatnonzero(np.asarray(trace[start:end])) + start).tolist()
+
+
+class EventQueue:
+    '''
+    Event-driven core of the simulation over the minutes [start, end).
+    Invocation events come from the non-zero cells of the traces and
+    keep-alive expiry events are pushed when a keep alive is decided, so only
+    the minutes with an invocation or an expiry are visited and, in each, only
+    the functions concerned (in ascending order, as a dense minute scan would).
+    Expiry events are not removed when the keep alive ends earlier (the
+    function is invoked, or the pool is adjusted): the consumer checks the pool.
+    The expiries of warm_pool.WarmPool pools are taken from their own heaps.
+    '''
+    def __init__(self, traces, start, end, pools=()):
+        self.start = start
+        self.end = end
+        window = np.asarray(traces[:, start:end])
+        minute, function = np.nonzero(window.T)
+        self.invoke_minutes, first = np.unique(minute, return_index=True)
+        self.invoke_minutes = (self.invoke_minutes + start).tolist()
+        self.invoke_functions = np.split(function, first[1:]) if len(function) else []
+        self.expiry = []
+        self.pools = pools
+        #next invocation minute
+        self.k = 0
+
+    def push_expiry(self, end_time, function):
+        #keep alive of function ends at end_time
+        if end_time < self.end:
+            heapq.heappush(self.expiry, (end_time, function))
+
+    def state(self):
+        return {"k": self.k, "expiry": list(self.expiry)}
+
+    def restore(self, state):
+        self.k = state["k"]
+        self.expiry = list(state["expiry"])
+
+    def _next_expiry(self):
+        expiries = [pool.next_expiry() for pool in self.pools]
+        expiries = [end_time for end_time in expiries if end_time is not None]
+        if self.expiry:
+            expiries.append(self.expiry[0][0])
+        return min(expiries) if expiries else None
+
+    def next_minute(self):
+        #the next minute with an event, None after the last one before end
+        next_invoke = self.invoke_minutes[self.k] if self.k < len(self.invoke_minutes) else self.end
+        next_expiry = self._next_expiry()
+        minute = next_invoke if next_expiry is None else min(next_invoke, next_expiry)
+        return minute if minute < self.end else None
+
+    def take(self, minute):
+        '''
+        the functions with an event at minute (none when minute is not the
+        next event minute, as when a coordinator steps every shard)
+        '''
+        functions = []
+        if self.k < len(self.invoke_minutes) and self.invoke_minutes[self.k] == minute:
+            functions = self.invoke_functions[self.k]
+            self.k += 1
+        expiring = []
+        while self.expiry and self.expiry[0][0] <= minute:
+            expiring.append(heapq.heappop(self.expiry)[1])
+        for pool in self.pools:
+            expiring.extend(pool.pop_expired(minute))
+        return np.union1d(functions, expiring).astype(int).tolist()
+
+    def __iter__(self):
+        minute = self.next_minute()
+        while minute is not None:
+            yield minute, self.take(minute)
+            minute = self.next_minute()
@@ -0,0 +1,145 @@
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+import fire
+import ci_store
+
+
+class Forecaster(ABC):
+    '''
+    Forecast of the hourly carbon intensity of one or more regions
+    (regions x hours of the year). The simulated minute j is the hour
+    start_hour + j//60; the hours up to the current one are observed, the
+    later ones are predicted. Updating is vectorized over the regions and only
+    does work when the hour changes, so it can be called every minute.
+    '''
+    def __init__(self, hourly, start_hour):
+        self.hourly = np.atleast_2d(np.asarray(hourly, dtype=float))
+        self.start_hour = start_hour
+        self.hour = -1
+        #the year before start_hour is history
+        self.observe(start_hour-1)
+
+    def observe(self, hour):
+        #feed the hours (self.hour, hour]
+        for h in range(self.hour+1, hour+1):
+            self._update(h)
+        self.hour = max(self.hour, hour)
+
+    def _update(self, hour):
+        pass
+
+    @abstractmethod
+    def predict(self, steps):
+        '''
+        ci of the next steps hours after the last observed one (regions x steps)
+        '''
+
+    def mean_ci(self, minute, kat_grid):
+        '''
+        expected mean ci over the keep alive [minute, minute+kat) of every kat
+        (regions x kat), the current hour is known and the later ones predicted;
+        kat 0 gives the current ci
+        '''
+        self.observe(self.start_hour + minute//60)
+        kat_grid = np.asarray(kat_grid)
+        span = int(kat_grid.max(initial=0))
+        offset = minute % 60
+        steps = (offset+span-1)//60 if span > 0 else 0
+        hours = np.concatenate([self.hourly[:, self.hour:self.hour+1], self.predict(steps)], axis=1)
+        per_minute = hours[:, (offset+np.arange(span))//60]
+        cumulative = np.concatenate([np.zeros((len(hours), 1)), np.cumsum(per_minute, axis=1)], axis=1)
+        return np.where(kat_grid > 0, cumulative[:, kat_grid]/np.maximum(kat_grid, 1), hours[:, :1])
+
+
+class Persistence(Forecaster):
+    #the current hour lasts
+    def predict(self, steps):
+        return np.repeat(self.hourly[:, self.hour:self.hour+1], steps, axis=1)
+
+
+class SeasonalNaive(Forecaster):
+    #the same hour of the last observed season (period hours)
+    def __init__(self, hourly, start_hour, period=24):
+        self.period = period
+        super().__init__(hourly, start_hour)
+
+    def predict(self, steps):
+        ahead = np.arange(1, steps+1)
+        past = self.hour + ahead - self.period*np.ceil(ahead/self.period).astype(int)
+        if len(past) and past.min() < 0:
+            return Persistence.predict(self, steps)
+        return self.hourly[:, past]
+
+
+class AR1(Forecaster):
+    '''
+    x[t+1] = c + phi*x[t], fit incrementally by least squares on running sums
+    with exponential forgetting (a weight of decay per hour)
+    '''
+    def __init__(self, hourly, start_hour, decay=0.995):
+        self.decay = decay
+        regions = np.atleast_2d(hourly).shape[0]
+        #weighted n, sum x[t-1], sum x[t], sum x[t-1]^2, sum x[t-1]*x[t]
+        self.sums = np.zeros((5, regions))
+        super().__init__(hourly, start_hour)
+
+    def _update(self, hour):
+        if hour < 1:
+            return
+        prev, cur = self.hourly[:, hour-1], self.hourly[:, hour]
+        self.sums *= self.decay
+        self.sums += np.stack([np.ones_like(cur), prev, cur, prev*prev, prev*cur])
+
+    def coefficients(self):
+        n, sx, sy, sxx, sxy = self.sums
+        n = np.maximum(n, 1e-12)
+        var = sxx/n - (sx/n)**2
+        phi = np.where(var > 1e-12, (sxy/n - sx*sy/n/n)/np.where(var > 1e-12, var, 1), 1.0)
+        phi = np.clip(phi, -0.999, 0.999)
+        return sy/n - phi*sx/n, phi
+
+    def predict(self, steps):
+        c, phi = self.coefficients()
+        out = np.empty((len(c), steps))
+        x = self.hourly[:, self.hour]
+        for s in range(steps):
+            x = c + phi*x
+            out[:, s] = x
+        return out
+
+
+FORECASTERS = {"persistence": Persistence, "seasonal": SeasonalNaive, "ar": AR1}
+
+
+def make(name, hourly, start_hour):
+    if name not in FORECASTERS:
+        raise ValueError(f"unknown forecaster {name}, choose from {list(FORECASTERS)}")
+    return FORECASTERS[name](hourly, start_hour)
+
+
+def evaluate(
+    regions: list=["US-CAL", "US-FLA", "US-NY", "US-TEN", "US-TEX"],
+    start_hour: int=800,
+    hours: int=12*24,
+    horizon: int=1,
+):
+    '''
+    mean absolute error of the horizon-hours-ahead forecast of every model
+    over [start_hour, start_hour+hours), all regions updated together
+    '''
+    regions = [regions] if isinstance(regions, str) else regions
+    hourly = np.stack([ci_store.get_region(region).hourly for region in regions])
+    rows = []
+    for name, model in FORECASTERS.items():
+        forecaster = model(hourly, start_hour)
+        error = np.zeros(len(regions))
+        for h in range(start_hour, start_hour+hours):
+            forecaster.observe(h)
+            error += np.abs(forecaster.predict(horizon)[:, -1] - hourly[:, h+horizon])
+        rows.append({"forecaster": name, **dict(zip(regions, error/hours))})
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    fire.Fire(evaluate)
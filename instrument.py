@@ -0,0 +1,141 @@
+import json
+import time
+from collections import defaultdict
+import pandas as pd
+import utils
+import carbon_model
+import profile_catalog
+
+#functions whose calls are counted: (owner, attribute)
+CALLS = [(utils, "compute_exe"), (utils, "compute_kat"), (utils, "get_st"), (utils, "read_func_mem_size"),
+         (carbon_model.CarbonModel, "exe"), (carbon_model.CarbonModel, "keepalive"), (carbon_model.CarbonModel, "keepalive_pairs"),
+         (profile_catalog.ProfileCatalog, "app_profile"), (profile_catalog.ProfileCatalog, "server_info"),
+         (profile_catalog.ProfileCatalog, "func_mem_size")]
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.stack.append(self.name)
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter_ns()-self.start
+        path = ";".join(self.profiler.stack)
+        self.profiler.totals[path] += elapsed
+        self.profiler.calls[path] += 1
+        self.profiler.stack.pop()
+
+
+class Profiler:
+    '''
+    Timing collector of the simulation phases: `with profiler.phase(name):`
+    adds the time to the phase under the enclosing ones (a path a;b;c), and
+    counters of calls. report() prints the phases with their share of the
+    wall time, dump() writes them as JSON and as folded stacks (self time in
+    microseconds, for flamegraph.pl or speedscope).
+    '''
+    def __init__(self):
+        self.totals = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.stack = []
+        self.patched = []
+        self.start = time.perf_counter_ns()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def count_calls(self, targets=CALLS):
+        #wrap the targets to count their calls, until close
+        for owner, attribute in targets:
+            function = getattr(owner, attribute)
+            name = f"{getattr(owner, '__name__', owner)}.{attribute}"
+
+            def counted(*args, _function=function, _name=name, **kwargs):
+                self.counters[_name] += 1
+                return _function(*args, **kwargs)
+            setattr(owner, attribute, counted)
+            self.patched.append((owner, attribute, function))
+
+    def close(self):
+        for owner, attribute, function in reversed(self.patched):
+            setattr(owner, attribute, function)
+        self.patched = []
+
+    def wall(self):
+        return (time.perf_counter_ns()-self.start)/1e9
+
+    def phases(self):
+        '''
+        one row per phase path: calls, total and self seconds, mean
+        microseconds per call and share of the wall time
+        '''
+        wall = self.wall()
+        rows = []
+        for path, total in self.totals.items():
+            children = sum(value for child, value in self.totals.items() if child.startswith(path+";") and child.count(";") == path.count(";")+1)
+            rows.append({"phase": path, "calls": self.calls[path], "total_s": total/1e9, "self_s": (total-children)/1e9,
+                         "mean_us": total/1e3/self.calls[path], "share": total/1e9/wall if wall else 0.0})
+        return sorted(rows, key=lambda row: row["phase"])
+
+    def report(self, minutes=None, events=None):
+        wall = self.wall()
+        print(f"wall time: {wall:.3f} s")
+        if minutes:
+            print(f"simulated minutes per second: {minutes/wall:.1f}")
+        if events:
+            print(f"event minutes per second: {events/wall:.1f}")
+        rows = self.phases()
+        if rows:
+            table = pd.DataFrame(rows)
+            table["phase"] = ["  "*path.count(";")+path.split(";")[-1] for path in table["phase"]]
+            print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+        if self.counters:
+            print(pd.Series(dict(self.counters), name="calls").sort_index().to_string())
+
+    def dump(self, path):
+        #path.json (phases and counters) and path.folded (flame graph stacks)
+        with open(f"{path}.json", "w") as file:
+            json.dump({"wall_s": self.wall(), "phases": self.phases(), "counters": dict(self.counters)}, file, indent=4)
+        with open(f"{path}.folded", "w") as file:
+            for row in self.phases():
+                file.write(f"{row['phase']} {int(round(row['self_s']*1e6))}\n")
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class NullProfiler:
+    #the profiler when profiling is off, every method does nothing
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+    def count(self, name, n=1):
+        pass
+
+    def count_calls(self, targets=CALLS):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL = NullProfiler()
@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class IntervalTracker:
+    '''
+    Invocation intervals of every function inside the sliding window
+    [minute-window_size, minute), updated incrementally when the window slides.
+    Each function keeps a ring buffer of its invoked minutes in the window and
+    cold[f, k], the number of intervals longer than k (a cumulative histogram),
+    so prob_cold of any kat is a lookup. Old windows are not retained.
+    '''
+    def __init__(self, invoked, window_size):
+        #invoked: (functions x minutes), non-zero if the function is invoked
+        self.window_size = window_size
+        function_num = len(invoked)
+        #functions invoked at each minute, the window only changes one minute
+        #after an invocation (it enters) or window_size+1 minutes after (it leaves)
+        minute, function = np.nonzero(np.asarray(invoked).T)
+        minutes, first = np.unique(minute, return_index=True)
+        self.invoked_at = dict(zip(minutes.tolist(), np.split(function, first[1:]))) if len(minute) else {}
+        self.slides = np.union1d(minutes+1, minutes+1+window_size)
+        self.pos = np.zeros((function_num, window_size), dtype=int)
+        self.head = np.zeros(function_num, dtype=int)
+        self.count = np.zeros(function_num, dtype=int)
+        self.cold = np.zeros((function_num, window_size), dtype=int)
+        self.minute = 0
+
+    def state(self):
+        #the window, the invocation minutes are rebuilt from the traces
+        return {"pos": self.pos, "head": self.head, "count": self.count, "cold": self.cold, "minute": self.minute}
+
+    def restore(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    @property
+    def n_interval(self):
+        return np.maximum(self.count-1, 0)
+
+    def slide(self, entering, leaving):
+        '''
+        move the window by one minute, entering/leaving are the functions
+        invoked at the minute that enters/leaves the window
+        '''
+        self.minute += 1
+        minute_in = self.minute-1
+        minute_out = self.minute-1-self.window_size
+        grid = np.arange(self.window_size)[None, :]
+        leaving = np.asarray(leaving, dtype=int)
+        if len(leaving):
+            assert (self.pos[leaving, self.head[leaving]] == minute_out).all()
+            paired = leaving[self.count[leaving] >= 2]
+            second = self.pos[paired, (self.head[paired]+1) % self.window_size]
+            self.cold[paired] -= grid < (second-minute_out)[:, None]
+            self.head[leaving] = (self.head[leaving]+1) % self.window_size
+            self.count[leaving] -= 1
+        entering = np.asarray(entering, dtype=int)
+        if len(entering):
+            paired = entering[self.count[entering] >= 1]
+            last = self.pos[paired, (self.head[paired]+self.count[paired]-1) % self.window_size]
+            self.cold[paired] += grid < (minute_in-last)[:, None]
+            self.pos[entering, (self.head[entering]+self.count[entering]) % self.window_size] = minute_in
+            self.count[entering] += 1
+
+    def advance(self, minute):
+        #slide until the window is [minute-window_size, minute), skipping the minutes that change nothing
+        empty = np.zeros(0, dtype=int)
+        lo, hi = np.searchsorted(self.slides, [self.minute+1, minute+1])
+        for m in self.slides[lo:hi].tolist():
+            self.minute = m-1
+            self.slide(self.invoked_at.get(m-1, empty), self.invoked_at.get(m-1-self.window_size, empty))
+        self.minute = max(self.minute, minute)
+
+    def intervals(self, function):
+        index = (self.head[function]+np.arange(self.count[function])) % self.window_size
+        return np.diff(self.pos[function, index])
+
+    def cold_counts(self, functions, kat_grid):
+        '''
+        number of intervals longer than each kat (functions x kat) and the
+        number of intervals (functions)
+        '''
+        functions = np.asarray(functions, dtype=int)
+        kat = np.clip(np.asarray(kat_grid), 0, self.window_size-1)
+        return self.cold[functions][:, kat], self.n_interval[functions]
+
+    def prob_cold(self, function, kat):
+        n = self.n_interval[function]
+        if n == 0:
+            #no invocation
+            return 0.5,0.5
+        cold = self.cold[function, min(max(kat, 0), self.window_size-1)]
+        return cold/n, (n-cold)/n
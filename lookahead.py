@@ -0,0 +1,82 @@
+import itertools
+import numpy as np
+from carbon_model import get_carbon_model
+
+
+class Lookahead:
+    '''
+    Batched keep-alive choices of the lookahead baselines (oracle, carbon_opt)
+    for every invocation of one trace in [start, end).
+    For an invocation at j with the next one at j+gap, the choices are:
+    kat 0 (cold on each server), every kat in 1..min(gap-1, kat_max) (keep
+    alive on a server, cold on a server) and, if the next invocation is
+    within kat_max and before end, kat=gap with hit_options.
+    The choices are laid out (invocations x options) in the order of the
+    original per-invocation lists, invalid ones are masked, so the first
+    argmin is the original decision.
+    '''
+    def __init__(self, trace, start, end, app, server_pair, ci, hit_options, kat_max=30):
+        #hit_options: (kat server, exe server, warm) choices when the next invocation is hit
+        trace = np.asarray(trace)
+        self.trace = trace
+        self.minutes = np.flatnonzero(trace[start:end]) + start
+        self.counts = trace[self.minutes].astype(np.int64)
+        #distance to the next invocation, or to end
+        self.gap = np.diff(self.minutes, append=end)
+        self.hit = (self.gap <= kat_max) & (self.minutes+self.gap < end)
+        n = len(self.minutes)
+        servers = range(len(server_pair))
+
+        model = get_carbon_model(servers=server_pair)
+        a = model.app_index[app]
+        ci = np.asarray(ci, dtype=float)[self.minutes]
+        cold_carbon, warm_carbon = (x[a] for x in model.exe(ci))
+        kat_grid = np.arange(1, kat_max+1)
+        kat_carbon = model.keepalive(kat_grid, ci)[a]
+        cold_st, warm_st = model.cold_st[a], model.warm_st[a]
+
+        rows = np.arange(n)
+        #kat 0
+        kat = [np.zeros((n, len(servers)), dtype=np.int64)]
+        kat_c = [np.zeros((n, len(servers)))]
+        exe_c = [cold_carbon.T]
+        st = [np.broadcast_to(cold_st, (n, len(servers)))]
+        valid = [np.ones((n, len(servers)), dtype=bool)]
+        #keep alive, then cold
+        miss_kat, miss_server, miss_exe = np.array([(k, s, e) for k in kat_grid for s, e in itertools.product(servers, repeat=2)]).T
+        kat.append(np.broadcast_to(miss_kat, (n, len(miss_kat))))
+        kat_c.append(kat_carbon[miss_server, miss_kat-1].T)
+        exe_c.append(cold_carbon[miss_exe].T)
+        st.append(np.broadcast_to(cold_st[miss_exe], (n, len(miss_kat))))
+        valid.append(miss_kat[None, :] < np.minimum(self.gap, kat_max+1)[:, None])
+        #keep alive until the next invocation
+        hit_kat = np.clip(self.gap, 1, kat_max)-1
+        for server, exe, warm in hit_options:
+            kat.append(self.gap[:, None])
+            kat_c.append(kat_carbon[server, hit_kat, rows][:, None])
+            exe_c.append((warm_carbon if warm else cold_carbon)[exe][:, None])
+            st.append(np.full((n, 1), (warm_st if warm else cold_st)[exe]))
+            valid.append(self.hit[:, None])
+        self.kat = np.concatenate(kat, axis=1)
+        self.kat_carbon = np.concatenate(kat_c, axis=1)
+        self.exe_carbon = np.concatenate(exe_c, axis=1)
+        self.st = np.concatenate(st, axis=1)
+        self.valid = np.concatenate(valid, axis=1)
+
+    def decide(self, score):
+        #first option with the minimum score of each invocation
+        return np.argmin(np.where(self.valid, score, np.inf), axis=1)
+
+    def results(self, index):
+        '''
+        carbon and service time of each invocation of the chosen options,
+        one value per invocation minute (shared by its count invocations)
+        '''
+        rows = np.arange(len(index))
+        kat = self.kat[rows, index]
+        kat_carbon = self.kat_carbon[rows, index]
+        exe_carbon = self.exe_carbon[rows, index]
+        nxt = self.trace[self.minutes+kat].astype(np.int64)
+        #a hit shares the keep alive carbon between the invocations
+        carbon = np.where(nxt != 0, (nxt*kat_carbon + np.minimum(self.counts, nxt)*exe_carbon)/self.counts, kat_carbon+exe_carbon)
+        return carbon, self.st[rows, index]
@@ -1,5 +1,8 @@
 import fire
 import utils
+import result_store
+import distributed
+from metrics import Metrics
 import pandas as pd
 from pathlib import Path
 from optimizers import  perf_opt,carbon_opt,oracle,tech
@@ -17,41 +20,78 @@ def main(
     optimizer: str = 'eco-life',
     STlambda:float = 0.5,
     window_size: int = 20,
-    pso_size: int = 15
+    pso_size: int = 15,
+    workers: int = 1,
+    export_json: bool = False,
+    forecast: str = None,
+    cache_size: int = 0,
+    cache_ci_step: float = 1.0,
+    cache_decisions: bool = True,
+    packer: str = "greedy",
+    mem_limits: list = None,
+    checkpoint_every: int = 0,
+    resume: bool = False,
+    profile: bool = False,
+    profile_out: str = None,
+    metrics_every: int = 60,
+    metrics_out: str = None,
+    quiet: bool = False,
+    progress: bool = False
 ):
     if app_list is None:
         df = pd.read_csv(f"{Path(__file__).parents[0]}/function_mem.csv",header=None) 
         app_list = df.iloc[:, 0].tolist()
-    # load carbon intensity data
-    carbon_intensity, ci_max, ci_min,ci_avg = utils.load_carbon_intensity(region, start_hour, interval)
+    # load carbon intensity data, the simulation reads minutes [0, window_size+interval)
+    carbon_intensity, ci_max, ci_min,ci_avg = utils.load_carbon_intensity(region, start_hour, window_size+interval)
 
     #load trace:
     traces, trace_function_names,_ = utils.read_selected_traces()
-    for trace in traces:
-        assert len(trace) == len(carbon_intensity)
     function_mem_trace = [utils.read_func_mem_size(trace_function_names[i]) for i in range(len(traces))]
     
-    sum=0
+    sum = int(traces.sum())
 
-    for i in range(len(traces)):
-        for j in range(len(traces[0])):
-            if int(traces[i][j])!=0:
-                sum+=int(traces[i][j])
+    #eco-life: forecast the ci over the keep alive (persistence, seasonal or ar),
+    #pack the warm pools under memory pressure with packer (greedy, dp, fptas or auto),
+    #server_pair may list more servers (e.g. [i3,c5n,c5,m5zn]) with one memory limit each in mem_limits,
+    #by default mem_old for the first one and mem_new for the others;
+    #checkpoint every checkpoint_every simulated minutes, resume from the latest checkpoint;
+    #profile times the phases of eco-life (profile_out: also write profile_out.json/.folded);
+    #the progress (running averages, discards, warm pools) is recorded every metrics_every simulated
+    #minutes (traces for the baselines) to metrics_out (.jsonl or .csv) and printed unless quiet,
+    #progress draws a bar with the ETA instead
+    forecaster = None if forecast is None else utils.make_forecaster(forecast, region, start_hour)
+    if optimizer == "eco-life" and workers > 1:
+        #eco-life shards the functions over local processes, the warm pools are reconciled every minute
+        if checkpoint_every or resume or profile or profile_out is not None:
+            sys.exit("checkpoint_every, resume, profile and profile_out need a single process eco-life (workers=1)")
+        result_dir = distributed.run(shards=workers,region=region,start_hour=start_hour,interval=interval,mem_old=mem_old,mem_new=mem_new,mem_limits=mem_limits,server_pair=server_pair,kat_time=kat_time,STlambda=STlambda,window_size=window_size,pso_size=pso_size,forecast=forecast,cache_size=cache_size,cache_ci_step=cache_ci_step,cache_decisions=cache_decisions,packer=packer,metrics_every=metrics_every,metrics_out=metrics_out,quiet=quiet,progress=progress)
+    else:
+        result_dir = run_optimizer(optimizer,traces,trace_function_names,function_mem_trace,carbon_intensity,ci_max,ci_avg,region,interval,mem_old,mem_new,server_pair,kat_time,STlambda,window_size,pso_size,workers,forecaster=forecaster,cache_size=cache_size,cache_ci_step=cache_ci_step,cache_decisions=cache_decisions,packer=packer,mem_limits=mem_limits,checkpoint_every=checkpoint_every,resume=resume,profile=profile,profile_out=profile_out,metrics_every=metrics_every,metrics_out=metrics_out,quiet=quiet,progress=progress,start_hour=start_hour).result_dir
+    if export_json:
+        #st.json/carbon.json in the original layout
+        result_store.export_json(result_dir)
 
+def run_optimizer(optimizer,traces,trace_function_names,function_mem_trace,carbon_intensity,ci_max,ci_avg,region,interval,mem_old,mem_new,server_pair,kat_time,STlambda,window_size,pso_size,workers=1,result_dir=None,forecaster=None,cache_size=0,cache_ci_step=1.0,cache_decisions=True,packer="greedy",mem_limits=None,checkpoint_every=0,resume=False,profile=False,profile_out=None,metrics_every=60,metrics_out=None,quiet=False,progress=False,start_hour=None):
+    #eco-life records the simulated minutes, the baselines the traces
+    total, unit = (interval, "minute") if optimizer == "eco-life" else (len(traces), "trace")
+    metrics = Metrics(total, unit, metrics_out, every=metrics_every, quiet=quiet, progress=progress, append=resume and optimizer == "eco-life")
     if optimizer == "perf_opt":
-        optimizer = perf_opt.perf_opt(traces,trace_function_names,server_pair,carbon_intensity,window_size,interval) 
-        optimizer.optimize()
+        optimizer = perf_opt.perf_opt(traces,trace_function_names,server_pair,carbon_intensity,window_size,interval,result_dir) 
+        optimizer.optimize(workers, metrics)
     elif optimizer == "carbon_opt":
-        optimizer = carbon_opt.carbon_opt(traces,trace_function_names,server_pair,carbon_intensity,window_size,interval) 
-        optimizer.optimize()
+        optimizer = carbon_opt.carbon_opt(traces,trace_function_names,server_pair,carbon_intensity,window_size,interval,result_dir) 
+        optimizer.optimize(workers, metrics)
     elif optimizer == "oracle":
-        optimizer = oracle.oracle(traces,trace_function_names,server_pair,carbon_intensity,ci_avg,STlambda, window_size,interval) 
-        optimizer.optimize() 
+        optimizer = oracle.oracle(traces,trace_function_names,server_pair,carbon_intensity,ci_avg,STlambda, window_size,interval,result_dir) 
+        optimizer.optimize(workers, metrics) 
     elif optimizer == "eco-life":
-        optimizer = tech.tech(traces,trace_function_names,server_pair,kat_time,STlambda,carbon_intensity,window_size,mem_old,mem_new,ci_max,function_mem_trace,pso_size,region,interval)
+        if workers > 1:
+            sys.exit("eco-life shares the warm pools between functions, run it sharded with distributed.run")
+        optimizer = tech.tech(traces,trace_function_names,server_pair,kat_time,STlambda,carbon_intensity,window_size,mem_old,mem_new,ci_max,function_mem_trace,pso_size,region,interval,result_dir,forecaster,cache_size,cache_ci_step,cache_decisions,packer,mem_limits,checkpoint_every,resume,profile,profile_out,metrics,start_hour)
         optimizer.optimize()
     else: 
         sys.exit("input optimizer is not correct!")
+    return optimizer
    
 if __name__ == "__main__":
     fire.Fire(main)
@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+import sys
+import time
+
+FORMATS = ("jsonl", "csv")
+
+
+def _format(value):
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+class ProgressBar:
+    '''
+    one line bar of done/total steps with the rate and the ETA, redrawn on
+    stream at most every refresh seconds
+    '''
+    def __init__(self, total, unit="step", width=30, refresh=0.2, stream=None):
+        self.total = max(int(total), 1)
+        self.unit = unit
+        self.width = width
+        self.refresh = refresh
+        self.stream = stream if stream is not None else sys.stderr
+        self.start = time.time()
+        self.drawn = 0.0
+
+    def update(self, done, force=False):
+        now = time.time()
+        if not force and now-self.drawn < self.refresh:
+            return
+        self.drawn = now
+        done = min(done, self.total)
+        elapsed = now-self.start
+        rate = done/elapsed if elapsed > 0 else 0.0
+        eta = (self.total-done)/rate if rate > 0 else float("nan")
+        fill = int(self.width*done/self.total)
+        eta = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta == eta else "--:--:--"
+        self.stream.write(f"\r[{'#'*fill}{'.'*(self.width-fill)}] {done/self.total:4.0%} {done}/{self.total} {self.unit}s"
+                          f" {rate:.1f} {self.unit}s/s ETA {eta}")
+        self.stream.flush()
+
+    def close(self, done):
+        self.update(done, force=True)
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+class Metrics:
+    '''
+    Progress records of a run, in place of printing every step (a simulated
+    minute of eco-life, a trace of the baselines): every `every` steps
+    emit(done, record) keeps a record of the running averages and state.
+    Records are buffered and written to out as JSON lines or CSV (by the
+    extension of out, or fmt) every flush_every records; without quiet they
+    are also printed, with progress a live bar with the ETA is drawn on
+    stderr instead. With append the records are added to an existing out
+    (a resumed run, see truncate).
+    '''
+    def __init__(self, total, unit="minute", out=None, fmt=None, every=60, quiet=False, progress=False, flush_every=100, append=False):
+        fmt = fmt if fmt is not None else ("csv" if out is not None and str(out).endswith(".csv") else "jsonl")
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown metrics format {fmt}, choose from {list(FORMATS)}")
+        self.total = total
+        self.unit = unit
+        self.out = out
+        self.fmt = fmt
+        self.every = max(int(every), 1)
+        self.quiet = quiet
+        self.flush_every = flush_every
+        self.append = append
+        self.bar = ProgressBar(total, unit) if progress else None
+        self.buffer = []
+        self.records = 0
+        self.last = None
+        self.file = None
+        self.writer = None
+        self.start = time.time()
+
+    def due(self, done):
+        #whether the record after done steps is emitted (the last one always is)
+        return self.last is None or done-self.last >= self.every or done >= self.total
+
+    def emit(self, done, record):
+        '''
+        record (a flat dict, or a function making it) after done steps, when
+        due; the wall time is added
+        '''
+        if self.bar is not None:
+            self.bar.update(done)
+        if not self.due(done):
+            return False
+        self.last = done
+        record = {"wall_s": round(time.time()-self.start, 3), **(record() if callable(record) else record)}
+        self.records += 1
+        if self.out is not None:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.flush_every:
+                self.flush()
+        if not self.quiet and self.bar is None:
+            print(" ".join(f"{key}={_format(value)}" for key, value in record.items()))
+        return True
+
+    def log(self, message):
+        #a message of the run, printed unless quiet
+        if not self.quiet:
+            print(message)
+
+    def truncate(self, key, last):
+        '''
+        drop the records of out whose key is beyond last, those written after
+        the checkpoint a run is resumed from; the next ones are appended
+        '''
+        self.append = True
+        if self.out is None or not os.path.exists(self.out):
+            return
+        with open(self.out, "r", newline="") as file:
+            if self.fmt == "csv":
+                rows = list(csv.reader(file))
+                rows = rows[:1] + [row for row in rows[1:] if float(row[rows[0].index(key)]) <= last]
+            else:
+                lines = [line for line in file if line.strip() and json.loads(line)[key] <= last]
+        with open(self.out, "w", newline="") as file:
+            if self.fmt == "csv":
+                csv.writer(file).writerows(rows)
+            else:
+                file.write("".join(lines))
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.file = open(self.out, "a" if self.append else "w", newline="")
+            if self.fmt == "csv":
+                self.writer = csv.DictWriter(self.file, fieldnames=list(self.buffer[0]), extrasaction="ignore")
+                if self.file.tell() == 0:
+                    self.writer.writeheader()
+        if self.fmt == "csv":
+            self.writer.writerows(self.buffer)
+        else:
+            self.file.write("".join(json.dumps(record)+"\n" for record in self.buffer))
+        self.file.flush()
+        self.buffer = []
+
+    def close(self, done=None):
+        if self.bar is not None:
+            self.bar.close(done if done is not None else self.last or 0)
+        if self.out is not None:
+            self.flush()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
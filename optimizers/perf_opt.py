@@ -1,55 +1,70 @@
 import sys 
 sys.path.append("..") 
-import utils
+import parallel
+import result_store
+from metrics import Metrics
+from carbon_model import get_carbon_model
 from pathlib import Path
-import json
+import numpy as np
 
 class perf_opt:
-    def __init__(self,traces,trace_function_names,server_pair,ci_avg,window_size, interval)  -> None:
+    def __init__(self,traces,trace_function_names,server_pair,ci_avg,window_size, interval,result_dir=None)  -> None:
          self.traces = traces
          self.trace_function_names = trace_function_names
          self.server_pair = server_pair
          self.ci = ci_avg
          self.interval = interval
+         self.result_dir = result_dir if result_dir is not None else f"{Path(__file__).parents[1]}/results/service_time_opt"
          self.window_size = window_size
-    def optimize(self):
+    def optimize_function(self, i):
+        '''
+        results of one trace, independent of the others: every invocation
+        is kept alive on the new server until the next one and runs warm.
+        The per-invocation st/carbon are returned run-length encoded, one
+        value per invocation minute (shared by its count invocations)
+        '''
+        trace = np.asarray(self.traces[i])
+        nonzero_indices = np.flatnonzero(trace[self.window_size:self.window_size+self.interval]) + self.window_size
+        if len(nonzero_indices) == 0:
+            empty = np.zeros(0)
+            return nonzero_indices, nonzero_indices, empty, empty, 0, 0, 0
+        counts = trace[nonzero_indices].astype(np.int64)
+        inovke_interval = np.diff(nonzero_indices)
+        model = get_carbon_model(servers=self.server_pair)
+        a = model.app_index[self.trace_function_names[i]]
+        ci = np.asarray(self.ci, dtype=float)[nonzero_indices]
+        #the last invocation is charged like the previous one
+        ci[-1] = ci[max(len(ci)-2, 0)]
+        warm_carbon = model.exe(ci)[1][a, 1]
+        st_warm = model.warm_st[a, 1]
+        kc = model.keepalive_pairs(inovke_interval, ci[:-1])[a, 1]
+        st = np.full(len(counts), st_warm)
+        carbon = warm_carbon + np.append(kc, 0)
+        carbon[-1] = warm_carbon[-1]
+        #the sums keep the order of the sequential accumulation
+        st_sum = sum((st*counts).tolist())
+        carbon_terms = np.stack([warm_carbon[:-1]*counts[:-1], counts[:-1]*kc], axis=1).ravel().tolist()
+        carbon_sum = sum(carbon_terms + [warm_carbon[-1]*counts[-1]])
+        #the last invocation is not counted
+        sum1 = int(counts[:-1].sum())
+        return nonzero_indices, counts, st, carbon, st_sum, carbon_sum, sum1
+
+    def optimize(self, workers=1, metrics=None):
         function_num = len(self.traces)
         st_sum = 0
         carbon_sum = 0
-        inovke_interval = []
         sum1 = 0
-        result_st = {}
-        result_carbon = {}
-        
-        for i in range(len(self.traces)):
-            indices = [i for i, num in enumerate(self.traces[i][self.window_size:self.window_size+self.interval]) if int(num) != 0]
-            nonzero_indices = [i+self.window_size for i in indices]
-            inovke_interval = [nonzero_indices[i+1] - nonzero_indices[i] for i in range(len(nonzero_indices)-1)]
-            result_st[i] = []
-            result_carbon[i] = []
-
-            for index, invoke in enumerate(inovke_interval):
-                sum1+=int(self.traces[i][nonzero_indices[index]])
-                cold_carbon,warm_carbon= utils.compute_exe(self.trace_function_names[i], self.server_pair,self.ci[nonzero_indices[index]])
-                st_warm = utils.get_st(self.trace_function_names[i],self.server_pair[1])
-                carbon_sum+=warm_carbon[1]*int(self.traces[i][nonzero_indices[index]])
-                st_sum+=st_warm[1]*int(self.traces[i][nonzero_indices[index]])
-                for _ in range(int(self.traces[i][nonzero_indices[index]])):
-                    result_st[i].append(st_warm[1])
-                kc = utils.compute_kat(self.trace_function_names[i], self.server_pair[1], invoke, self.ci[nonzero_indices[index]])
-                carbon_sum+=int(self.traces[i][nonzero_indices[index]])*kc
-                for _ in range(int(self.traces[i][nonzero_indices[index]])):
-                    result_carbon[i].append(warm_carbon[1]+kc)   
-            st_sum+=st_warm[1]*int(self.traces[i][nonzero_indices[-1]])
-            carbon_sum+=warm_carbon[1]*int(self.traces[i][nonzero_indices[-1]])
-            for _ in range(int(self.traces[i][nonzero_indices[-1]])):
-                result_st[i].append(st_warm[1])
-                result_carbon[i].append(warm_carbon[1])      
-            print("finish trace:", i)
-            print(f"current the avg time is:{st_sum/sum1}, and the avg carbon is {carbon_sum/sum1}")
-        with open(f"{Path(__file__).parents[1]}/results/service_time_opt/st.json", "w") as file1:
-            json.dump(result_st, file1, indent=4)
-        with open(f"{Path(__file__).parents[1]}/results/service_time_opt/carbon.json", "w") as file2:
-             json.dump(result_carbon, file2, indent=4)
+        results = parallel.map_functions(self.optimize_function, function_num, workers)
+        #progress records of the running averages, by default printed every 60 traces
+        metrics = metrics if metrics is not None else Metrics(function_num, "trace")
+        with result_store.ResultWriter(self.result_dir, function_num, per_invocation=True) as writer:
+            for i in range(function_num):
+                minutes, counts, st, carbon, st_sum1, carbon_sum1, sum_invoke = results[i]
+                writer.append(i, minutes, counts, st, carbon)
+                st_sum+=st_sum1
+                carbon_sum+=carbon_sum1
+                sum1+=sum_invoke
+                metrics.emit(i+1, {"trace": i, "invocations": sum1, "st": st_sum/sum1 if sum1 else 0.0, "carbon": carbon_sum/sum1 if sum1 else 0.0})
+        metrics.close(function_num)
         print("finish all traces!")
-        print("--------------------------------------------------")
\ No newline at end of file
+        print("--------------------------------------------------")
@@ -1,11 +1,20 @@
 from pathlib import Path
-import sys 
-sys.path.append("..") 
+import sys
+sys.path.append("..")
 import utils
 import exe_decide
-import pso
-from pathlib import Path
-import json
+import swarm_bank
+import interval_tracker
+import event_core
+import result_store
+import decision_cache
+import warm_pool
+import carbon_model
+import packer
+import checkpoint
+import instrument
+from metrics import Metrics
+import numpy as np
 import time
 class tech:
     def __init__(self,
@@ -22,7 +31,20 @@ class tech:
                 function_mem_trace:list,
                 pso_size:int,
                 region:str,
-                interval:int
+                interval:int,
+                result_dir:str=None,
+                forecaster=None,
+                cache_size:int=0,
+                cache_ci_step:float=1.0,
+                cache_decisions:bool=True,
+                packer_mode:str="greedy",
+                mem_limits:list=None,
+                checkpoint_every:int=0,
+                resume:bool=False,
+                profile:bool=False,
+                profile_out:str=None,
+                metrics=None,
+                start_hour:int=None
                 )  -> None:
          self.traces = traces
          self.trace_function_names = trace_function_names
@@ -34,207 +56,359 @@ class tech:
          self.window_size = window_size
          self.mem_old_limit = mem_old_limit
          self.mem_new_limit = mem_new_limit
+         #memory limit of every server, by default mem_old_limit for the first (oldest) one and mem_new_limit for the others
+         self.mem_limits = list(mem_limits) if mem_limits is not None else [mem_old_limit]+[mem_new_limit]*(len(server_pair)-1)
+         assert(len(self.mem_limits)==len(server_pair))
          self.ci_avg = ci_avg
          self.function_mem_trace = function_mem_trace
          self.pso_size = pso_size
          self.region = region
+         #the hour of minute 0 of carbon_intenstiy, checked when resuming
+         self.start_hour = start_hour
          self.interval = interval
+         self.result_dir = result_dir if result_dir is not None else f"{Path(__file__).parents[1]}/results/eco_life"
+         #forecast.Forecaster of the region, the keep alive is then charged at the expected ci over its kat
+         self.forecaster = forecaster
+         #LRU caches of fitness rows (exact inputs) and, with cache_decisions, of decisions
+         #(ci bucket of cache_ci_step, skips the swarm update); a cache_size of 0 disables them
+         self.cache_size = cache_size
+         self.cache_ci_step = cache_ci_step
+         self.cache_decisions = cache_decisions
+         #packer.Packer mode of the warm pools when memory is exceeded
+         self.packer_mode = packer_mode
+         #checkpoint the state every checkpoint_every simulated minutes (0: never) to result_dir/checkpoints,
+         #with resume the run restarts from the latest checkpoint
+         self.checkpoint_every = checkpoint_every
+         self.checkpoint_dir = f"{self.result_dir}/checkpoints"
+         self.resume = resume
+         #time the phases of the run (instrument.Profiler), report them at the end
+         #and with profile_out dump them to profile_out.json/.folded
+         self.profile = profile
+         self.profile_out = profile_out
+         self.profiler = instrument.NULL
+         #metrics.Metrics of the progress records (running averages, discards and
+         #warm pools), by default printed every 60 simulated minutes
+         self.metrics = metrics
     def optimize(self):
-        
-        time_length = len(self.traces[0])
+        try:
+            self.start()
+            events = self.simulate()
+        finally:
+            #the call counters of the profiler wrap utils and CarbonModel for every caller
+            self.profiler.close()
+        if self.profile:
+            self.profiler.report(minutes=self.interval, events=events)
+            if self.profile_out is not None:
+                self.profiler.dump(self.profile_out)
+
+    def simulate(self):
+        #the run after start, returns the number of event minutes
+        next_checkpoint = self.window_size+self.checkpoint_every
+        if self.metrics is None:
+            self.metrics = Metrics(self.interval, "minute")
+        metrics = self.metrics
+        if self.resume:
+            path = checkpoint.latest(self.checkpoint_dir)
+            if path is None:
+                metrics.truncate("minute", self.window_size-1)
+                metrics.log(f"no checkpoint in {self.checkpoint_dir}, starting from the beginning")
+            else:
+                minute = self.restore(checkpoint.load(path))
+                next_checkpoint = minute+self.checkpoint_every
+                #the records after the checkpoint are made again
+                metrics.truncate("minute", minute)
+                metrics.log(f"resumed after time: {minute}")
+        #the rows flushed at the checkpoints are kept (parts, rows) when resuming
+        parts, rows = self.written
+        self.writer = result_store.ResultWriter(self.result_dir, len(self.traces), per_invocation=False, parts=parts, rows=rows)
+        checkpoint_seconds = 0
+        profiler = self.profiler
+        events = 0
+        for j, functions in self.events:
+            events += 1
+            decisions = self.execute(j, functions)
+            sum_discard = self.place(j, decisions)
+            self.discard_list.append(sum_discard)
+            with profiler.phase("metrics"):
+                metrics.emit(j-self.window_size+1, lambda: self.record(j))
+            if self.checkpoint_every and j >= next_checkpoint:
+                start = time.time()
+                with profiler.phase("checkpoint"):
+                    self.flush_rows(j)
+                    metrics.flush()
+                    checkpoint.save(self.checkpoint_dir, j, self.state(j))
+                checkpoint_seconds += time.time()-start
+                next_checkpoint = j+self.checkpoint_every
+        metrics.close(self.interval)
+        if self.checkpoint_every:
+            metrics.log(f"checkpoints: {checkpoint_seconds} seconds")
+        self.finish()
+        #the results are complete
+        checkpoint.clear(self.checkpoint_dir)
+        return events
+
+    def record(self, j):
+        #running averages, discards and the warm pool of every server after minute j
+        record = {"minute": int(j), "invocations": self.sum1, "st": self.sum_st/self.sum1 if self.sum1 else 0.0,
+                  "carbon": self.sum_carbon/self.sum1 if self.sum1 else 0.0, "discards": int(sum(self.discard_list))}
+        for s, pool in enumerate(self.warm_pools):
+            record[f"pool_functions_{s}"] = len(pool)
+            record[f"pool_units_{s}"] = int(sum(int(value["num"]) for value in pool.values()))
+            record[f"pool_mem_{s}"] = pool.mem/warm_pool.MEM_UNIT
+            record[f"mem_used_{s}"] = pool.mem/warm_pool.MEM_UNIT/self.mem_limits[s] if self.mem_limits[s] else 0.0
+        return record
+
+    def config(self):
+        #what a checkpoint must match to be resumed
+        return {"functions": list(self.trace_function_names), "server_pair": list(self.server_pair), "kat_time": self.kat_time,
+                "st_lambda": self.st_lambda, "window_size": self.window_size, "interval": self.interval, "mem_limits": self.mem_limits,
+                "pso_size": self.pso_size, "region": self.region, "cache_size": self.cache_size, "cache_ci_step": self.cache_ci_step,
+                "cache_decisions": self.cache_decisions, "packer_mode": self.packer_mode, "start_hour": self.start_hour,
+                "forecaster": None if self.forecaster is None else type(self.forecaster).__name__}
+
+    def state(self, minute):
+        '''
+        the state of the run after minute: the mutable part of every component
+        (what is derived from the traces is rebuilt by start) and the RNG
+        '''
+        return {"minute": minute, "config": self.config(), "rng": checkpoint.rng_state(),
+                "tracker": self.tracker.state(), "events": self.events.state(), "swarms": self.swarms.state(),
+                "warm_pools": [dict(pool.items()) for pool in self.warm_pools],
+                "decisions_cache": self.decisions_cache, "fitness_cache": self.fitness_cache,
+                "pool_packer": self.pool_packer, "forecaster": self.forecaster,
+                "sums": (self.sum_st, self.sum_carbon, self.sum1), "discard_list": self.discard_list,
+                "written": self.written, "result_st": self.result_st, "result_carbon": self.result_carbon,
+                "metrics_last": self.metrics.last}
+
+    def restore(self, state):
+        #continue from a state of a started run, returns its minute
+        if state["config"] != self.config():
+            raise ValueError("the checkpoint is of another configuration")
+        self.tracker.restore(state["tracker"])
+        self.events.restore(state["events"])
+        self.swarms.restore(state["swarms"])
+        for pool, entries in zip(self.warm_pools, state["warm_pools"]):
+            pool.reset(entries)
+        self.decisions_cache = state["decisions_cache"]
+        self.fitness_cache = state["fitness_cache"]
+        self.swarms.fitness_cache = self.fitness_cache
+        self.pool_packer = state["pool_packer"]
+        self.forecaster = state["forecaster"]
+        self.sum_st, self.sum_carbon, self.sum1 = state["sums"]
+        self.discard_list = state["discard_list"]
+        self.written = state["written"]
+        self.result_st = state["result_st"]
+        self.result_carbon = state["result_carbon"]
+        #the records keep the schedule of the interrupted run
+        self.metrics.last = state["metrics_last"]
+        checkpoint.set_rng_state(state["rng"])
+        return state["minute"]
+
+    def start(self, pool_packer=None):
+        '''
+        state of the simulation; pool_packer packs the warm pools under memory
+        pressure (a packer.Packer of packer_mode by default)
+        '''
         function_num = len(self.traces)
-        invoke_interval = [[] for _ in range(function_num)]#this is used for the past window size invocation interval
-        old_warm_pool = {}
-        new_warm_pool = {}
+        self.profiler = instrument.Profiler() if self.profile else instrument.NULL
+        self.profiler.count_calls()
+        #invocation intervals in the past window size
+        self.tracker = interval_tracker.IntervalTracker(self.traces,self.window_size)
+        # keep alive pool of every server with its expiry heap and memory
+        self.warm_pools = [warm_pool.WarmPool(self.function_mem_trace) for _ in range(len(self.server_pair))]
+        self.model = carbon_model.get_carbon_model(servers=self.server_pair)
+
+        # the DPSO swarms of all functions
+        self.decisions_cache = decision_cache.LRUCache(self.cache_size) if self.cache_size and self.cache_decisions else None
+        self.fitness_cache = decision_cache.LRUCache(self.cache_size) if self.cache_size else None
+        self.pool_packer = pool_packer if pool_packer is not None else packer.Packer(self.packer_mode)
+        self.swarms = swarm_bank.SwarmBank(self.trace_function_names,self.server_pair,self.kat_time,self.st_lambda,self.ci_avg,self.pso_size,self.fitness_cache)
+        self.sum_st = 0
+        self.sum_carbon = 0
+        self.discard_list = []
+        self.result_st = [{} for _ in  range(function_num)]
+        self.result_carbon = [{} for _ in  range(function_num)]
+        #parts and rows of the results already written
+        self.written = (0, 0)
+        self.sum1 = 0
 
-        new_function={}
-        sum_st = 0
-        sum_carbon = 0
-        discard_list = []
-        result_st = [{} for _ in  range(function_num)]
-        result_carbon = [{} for _ in  range(function_num)]
-        sum1 = 0
-        for i in range(function_num):
-            result_st[i] = {}
+        # only the minutes with an invocation or a keep-alive expiry are visited
+        self.events = event_core.EventQueue(self.traces,self.window_size,self.window_size+self.interval,self.warm_pools)
+
+    def execute(self, j, functions):
+        '''
+        expire the keep alives and execute the invocations of the functions
+        at minute j, returns the new keep alive decisions of every server
+        '''
+        model = self.model
+        warm_pools = self.warm_pools
+        result_st = self.result_st
+        result_carbon = self.result_carbon
+        decisions = [{} for _ in range(len(self.server_pair))]
+        invoked = []
+        profiler = self.profiler
+        with profiler.phase("window"):
+            self.tracker.advance(j)
+        cold_carbon, warm_carbon = model.exe(self.carbon_intensity[j])
+        for i in functions:
+            function_name = self.trace_function_names[i]
+            concurrent_function = int(self.traces[i][j])
             
-        for i in range(function_num):
-            result_carbon[i] = {}
+            if concurrent_function==0:
+                # this function in not invoked, if it contains in a warm pool, then we need to check whether it is expired
+                with profiler.phase("expire"):
+                    for s, pool in enumerate(warm_pools):
+                        if i in pool and int(pool[i]["end_time"]) <= j:
+                            last = int(pool[i]["end_time"]) - int(pool[i]["start_time"])
+                            kat_carbon = int(pool[i]['num'])*utils.compute_kat(function_name,self.server_pair[s],last,self.carbon_intensity[int(pool[i]["start_time"])])
+                            self.sum_carbon += kat_carbon
 
-        for j in range(self.window_size,self.window_size+self.interval):
-            print(f"begin time: {j}")
-            old_decision = {}
-            new_decision = {}
-            # making execution decision
-            start = time.time()
-            sum_discard =0
-            sum_per_function = 0
-            for i in range(function_num):
-                window_invoc = self.traces[i][j-self.window_size:j]
-                invoc_index = [i for i, num in enumerate(window_invoc) if int(num) != 0]
-                interval = [invoc_index[i+1] - invoc_index[i] for i in range(len(invoc_index)-1)]
-                invoke_interval[i].append(interval)
-                
-                function_name = self.trace_function_names[i]
-                old_cold_st, old_warm_st = utils.get_st(function_name, self.server_pair[0])
-                new_cold_st, new_warm_st = utils.get_st(function_name, self.server_pair[1])
-                cold_carbon, warm_carbon = utils.compute_exe(function_name, self.server_pair,self.carbon_intensity[j])
-                old_cold_carbon = cold_carbon[0]
-                new_cold_carbon =cold_carbon[1]
-                old_warm_carbon = warm_carbon[0]
-                new_warm_carbon = warm_carbon[1]
-                
-                concurrent_function = int(self.traces[i][j])
-                
-                if concurrent_function==0:
-                    # this function in not invoked, if it contains in the warm pool, then we need to check whether it is expired
-                    if i in old_warm_pool:
-                        if int(old_warm_pool[i]["end_time"]) <= j:
-                            
-                            last = int(old_warm_pool[i]["end_time"]) - int(old_warm_pool[i]["start_time"])
-                            kat_carbon = int(old_warm_pool[i]['num'])*utils.compute_kat(function_name,self.server_pair[0],last,self.carbon_intensity[int(old_warm_pool[i]["start_time"])])
-                            sum_carbon += kat_carbon
-                            
                             #write result:
-                            invoke_time = int(old_warm_pool[i]["invoke_time"])
+                            invoke_time = int(pool[i]["invoke_time"])
                             if invoke_time not in result_carbon[i]:
                                 sys.exit("error")
                             else:
                                 result_carbon[i][invoke_time]["carbon"]+=kat_carbon
-                            del old_warm_pool[i]
-                    if i in new_warm_pool:
-                        if new_warm_pool[i]["end_time"] <= j:
-                            last = int(new_warm_pool[i]["end_time"] - new_warm_pool[i]["start_time"])
-                            kat_carbon = int(new_warm_pool[i]['num'])*utils.compute_kat(function_name,self.server_pair[1],last,self.carbon_intensity[new_warm_pool[i]["start_time"]])
-                            sum_carbon += kat_carbon
-                            
-                            #write result:
-                            invoke_time = int(new_warm_pool[i]["invoke_time"])
-                            if invoke_time not in result_carbon[i]:
-                                sys.exit("error")
-                            else:
-                                result_carbon[i][invoke_time]["carbon"]+=kat_carbon
-
-                            del new_warm_pool[i]
-                else:
-                    sum_per_function +=concurrent_function
-                    sum1+=concurrent_function
-                    #execute function:
-                    st_per_func,carbon_per_func,result_st[i],result_carbon[i] = exe_decide.exe_loc_decision(old_warm_pool, 
-                     new_warm_pool,
+                            del pool[i]
+            else:
+                app = model.app_index[function_name]
+                self.sum1+=concurrent_function
+                #execute function:
+                with profiler.phase("exe_decide"):
+                    st_per_func,carbon_per_func,result_st[i],result_carbon[i] = exe_decide.exe_loc_decision(warm_pools,
                      i,
                      concurrent_function,
-                     old_cold_st,
-                     new_cold_st,
-                     old_cold_carbon,
-                     new_cold_carbon,
-                     old_warm_st,
-                     new_warm_st,
-                     old_warm_carbon,
-                     new_warm_carbon,
+                     model.cold_st[app],
+                     model.warm_st[app],
+                     cold_carbon[app, :, 0],
+                     warm_carbon[app, :, 0],
                      self.st_lambda,
                      self.trace_function_names[i],
                      self.server_pair,
                      self.carbon_intensity,int(j),result_st[i],result_carbon[i])
-                    assert(st_per_func>0)
-                    assert(carbon_per_func>0)
-                    sum_st+=st_per_func
-                    sum_carbon+=carbon_per_func
-                
-                    # function is invoked    
-                    if i not in new_function:
-                        #first invoke set the pso optimzier
-                        parameters = [self.pso_size,self.kat_time, self.st_lambda]
-                        new_function[i]= pso.PSO(parameters,self.server_pair,function_name,self.ci_avg,self.carbon_intensity[j],invoke_interval[i][j-self.window_size])
-                        a,_ = new_function[i].main(self.carbon_intensity[j],invoke_interval[i][j-self.window_size])
-                        decision = a
-                        ka_loc = int(decision[0])
-                        ka_last = int(decision[1])
-                        if ka_loc == 0 and ka_last!=0:
-                            going_ka = {"num":int(self.traces[i][j]),
-                            "start_time":j,
-                            "end_time":int(j+ka_last),
-                            "invoke_time":int(j)
-                             }
-                            old_decision[i] = going_ka
-                        elif ka_loc == 1 and ka_last!=0:
-                            going_ka = {"num":int(self.traces[i][j]),
-                            "start_time":j,
-                            "end_time":int(j+ka_last),
-                            "invoke_time":int(j)
-                             }
-                            new_decision[i] = going_ka
-                        else:
-                            pass
-                    else: 
-                        
-                        decision,b = new_function[i].main(self.carbon_intensity[j],invoke_interval[i][j-self.window_size])
-                        ka_loc = int(decision[0])
-                        ka_last = int(decision[1])
-                        if ka_loc == 0 and ka_last!=0:
-                            going_ka = {"num":int(self.traces[i][j]),
-                            "start_time":j,
-                            "end_time":int(j+ka_last),
-                            "invoke_time":int(j)
-                            }
-                            old_decision[i] = going_ka
-                        elif ka_loc == 1 and ka_last!=0:
-                            going_ka = {"num":int(self.traces[i][j]),
-                            "start_time":int(j),
-                            "end_time":int(j+ka_last),
-                            "invoke_time":int(j)
-                             }
-                            new_decision[i] = going_ka
-                        else:
-                            pass
-
+                assert(st_per_func>0)
+                assert(carbon_per_func>0)
+                self.sum_st+=st_per_func
+                self.sum_carbon+=carbon_per_func
             
-            mem_checker =utils.mem_check(self.mem_new_limit,self.mem_old_limit, old_decision,new_decision,self.function_mem_trace,new_warm_pool,old_warm_pool)
-            if mem_checker==0:
-                #not exceed the mem limit
-                for key, value in old_decision.items():
-                    old_warm_pool[key] = value
-                for key, value in new_decision.items():
-                    new_warm_pool[key] = value
+                # function is invoked, its swarm is advanced with the others below
+                invoked.append(i)
 
-            elif  mem_checker==1:
-                #change old
-                for key, value in new_decision.items():
-                    new_warm_pool[key] = value
-                old_warm_pool,left_pool,kat_carbon,result_carbon = utils.adjust_pool(self.mem_old_limit,self.function_mem_trace,old_warm_pool,old_decision,invoke_interval,0,self.trace_function_names,self.server_pair,self.carbon_intensity,int(j),self.window_size,result_carbon)
-                sum_carbon+=kat_carbon
-                new_warm_pool,kat_carbon1,discard,result_carbon = utils.add_discard_pool(new_warm_pool,left_pool,self.mem_new_limit,self.function_mem_trace,self.trace_function_names,1,invoke_interval,self.server_pair,int(j),self.window_size,self.carbon_intensity,result_carbon)
-                sum_carbon+=kat_carbon1
-                if discard!=0:
-                    for key,value in discard.items():
-                        sum_discard+=value['num']
-                #exceed old mem limit
-            elif mem_checker ==2:
-                for key, value in old_decision.items():
-                    old_warm_pool[key] = value
-                new_warm_pool,left_pool,kat_carbon,result_carbon = utils.adjust_pool(self.mem_new_limit,self.function_mem_trace,new_warm_pool,new_decision,invoke_interval,1,self.trace_function_names,self.server_pair,self.carbon_intensity,j,self.window_size,result_carbon)
-                sum_carbon+=kat_carbon
-                old_warm_pool,kat_carbon1,discard,result_carbon = utils.add_discard_pool(old_warm_pool,left_pool,self.mem_old_limit,self.function_mem_trace,self.trace_function_names,0,invoke_interval,self.server_pair,int(j),self.window_size,self.carbon_intensity,result_carbon)
-                sum_carbon+=kat_carbon1
-                if discard!=0:
-                    for key,value in discard.items():
-                        sum_discard+=value['num']
-                #change new
-            elif mem_checker ==3:
-                old_warm_pool,left1,kat_carbon1,result_carbon= utils.adjust_pool(self.mem_old_limit,self.function_mem_trace,old_warm_pool,old_decision,invoke_interval,0,self.trace_function_names,self.server_pair,self.carbon_intensity,int(j),self.window_size,result_carbon)
-                new_warm_pool,left2,kat_carbon2,result_carbon = utils.adjust_pool(self.mem_new_limit,self.function_mem_trace,new_warm_pool,new_decision,invoke_interval,1,self.trace_function_names,self.server_pair,self.carbon_intensity,int(j),self.window_size,result_carbon)
-                sum_carbon+=kat_carbon1+kat_carbon2
-                for key,value in left1.items():
-                    sum_discard+=value['num']
-                for key,value in left2.items():
-                    sum_discard+=value['num']
+        # advance the swarms of all invoked functions at once
+        swarms = self.swarms
+        with profiler.phase("window"):
+            cold, n_interval = self.tracker.cold_counts(invoked, swarms.kat_grid)
+        with profiler.phase("pso"):
+            kat_ci = self.forecaster.mean_ci(j, swarms.kat_grid)[0] if self.forecaster is not None and len(invoked) else None
+            if self.decisions_cache is None:
+                decisions_made = swarms.step(invoked, self.carbon_intensity[j], cold, n_interval, kat_ci)
             else:
-                sys.exit("mem_checker is not correct!")     
-            print(f"finish time: {j}")
-            discard_list.append(sum_discard)
-            # print(f"discard funcions: {sum_discard}")
-            print(f"current service time is:{sum_st/sum1}, carbon is: {sum_carbon/sum1}")
-        print(f"service time is:{sum_st/sum1}, carbon is: {sum_carbon/sum1}")
-        with open(f"{Path(__file__).parents[1]}/results/eco_life/carbon.json", "w") as file:
-            json.dump(result_carbon, file, indent=4)
-        with open(f"{Path(__file__).parents[1]}/results/eco_life/st.json", "w") as file:
-            json.dump(result_st, file, indent=4)
+                # functions seen with the same inputs reuse their decision and skip the swarm update
+                cache_keys = decision_cache.keys(invoked, self.carbon_intensity[j], cold, n_interval, kat_ci, self.cache_ci_step)
+                decisions_made = [self.decisions_cache.get(key) for key in cache_keys]
+                miss = [n for n, decision in enumerate(decisions_made) if decision is None]
+                if miss:
+                    stepped = swarms.step(np.asarray(invoked)[miss], self.carbon_intensity[j], cold[miss], n_interval[miss], kat_ci)
+                    for n, decision in zip(miss, stepped):
+                        decisions_made[n] = decision
+                        self.decisions_cache.put(cache_keys[n], decision)
+        for i, decision in zip(invoked, decisions_made):
+            ka_loc = int(decision[0])
+            ka_last = int(decision[1])
+            if ka_last!=0:
+                going_ka = {"num":int(self.traces[i][j]),
+                "start_time":j,
+                "end_time":int(j+ka_last),
+                "invoke_time":int(j)
+                 }
+                decisions[ka_loc][i] = going_ka
+        return decisions
+
+    def place(self, j, decisions):
+        '''
+        admit the keep alive decisions of minute j into the warm pools,
+        returns the number of discarded containers
+        '''
+        warm_pools = self.warm_pools
+        server_num = len(self.server_pair)
+        sum_discard = 0
+        profiler = self.profiler
+        with profiler.phase("mem_check"):
+            over = utils.mem_check(self.mem_limits,decisions,warm_pools,self.function_mem_trace,self.pool_packer)
+        for s in range(server_num):
+            if not over[s]:
+                #not exceed the mem limit
+                for key, value in decisions[s].items():
+                    warm_pools[s][key] = value
+        # the servers over their limit keep the units of most impact, the others are offered
+        # to the servers under their limit in order (and dropped when none can take them)
+        kat_carbon = 0
+        left_pool = {}
+        for s in range(server_num):
+            if over[s]:
+                with profiler.phase("adjust_pool"):
+                    adjusted,left,kat_carbon_s,self.result_carbon = utils.adjust_pool(self.mem_limits[s],self.function_mem_trace,warm_pools[s],decisions[s],self.tracker,s,self.trace_function_names,self.server_pair,self.carbon_intensity,int(j),self.window_size,self.result_carbon,self.pool_packer)
+                warm_pools[s].reset(adjusted)
+                kat_carbon+=kat_carbon_s
+                left_pool.update(left)
+        self.sum_carbon+=kat_carbon
+        if all(over):
+            for key,value in left_pool.items():
+                sum_discard+=value['num']
+            return sum_discard
+        for s in range(server_num):
+            if over[s]:
+                continue
+            offered = left_pool
+            with profiler.phase("add_discard_pool"):
+                combined,kat_carbon1,discard,self.result_carbon = utils.add_discard_pool(warm_pools[s],offered,self.mem_limits[s],self.function_mem_trace,self.trace_function_names,s,self.tracker,self.server_pair,int(j),self.window_size,self.carbon_intensity,self.result_carbon,self.pool_packer)
+            warm_pools[s].reset(combined)
+            self.sum_carbon+=kat_carbon1
+            left_pool = {}
+            if discard!=0:
+                # units of the pool are dropped, the offered ones go on to the next server
+                for key,value in discard.items():
+                    if key in offered:
+                        left_pool[key] = value
+                    else:
+                        sum_discard+=value['num']
+        for key,value in left_pool.items():
+            sum_discard+=value['num']
+        return sum_discard
+
+    def rows(self, before=None):
+        #(function, minutes, num, st, carbon) of every function, of the minutes before before
+        for i in range(len(self.traces)):
+            minutes = list(self.result_st[i]) if before is None else [m for m in self.result_st[i] if m < before]
+            yield (i, minutes, [self.result_st[i][m]["num"] for m in minutes],
+                   [self.result_st[i][m]["st"] for m in minutes], [self.result_carbon[i][m]["carbon"] for m in minutes])
+
+    def flush_rows(self, j):
+        '''
+        write the rows that can no longer change after minute j and drop them,
+        the checkpoints then only keep the open rows: the keep alive carbon is
+        charged to the invoke time of a warm container, so the minutes before
+        the oldest one in the pools are complete
+        '''
+        oldest = min((int(value["invoke_time"]) for pool in self.warm_pools for value in pool.values()), default=j+1)
+        for row in self.rows(before=oldest):
+            if len(row[1]):
+                self.writer.append(*row)
+                for m in row[1]:
+                    del self.result_st[row[0]][m]
+                    del self.result_carbon[row[0]][m]
+        self.writer.flush()
+        self.written = (self.writer.parts, self.writer.rows)
+
+    def finish(self):
+        print(f"service time is:{self.sum_st/self.sum1}, carbon is: {self.sum_carbon/self.sum1}")
+        if self.decisions_cache is not None:
+            print(f"decision cache: {self.decisions_cache.stats()}")
+        if self.fitness_cache is not None:
+            print(f"fitness cache: {self.fitness_cache.stats()}")
+        if self.pool_packer.calls:
+            print(f"packer: {self.pool_packer.stats()}")
+        with self.profiler.phase("results"):
+            with self.writer as writer:
+                for row in self.rows():
+                    writer.append(*row)
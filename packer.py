@@ -0,0 +1,186 @@
+import time
+import numpy as np
+from warm_pool import mem_units, MEM_UNIT
+
+MODES = ("greedy", "dp", "fptas", "auto")
+
+
+def greedy(capacity, sizes, quantities, order):
+    '''
+    units of each item packed by taking the items in order, as many units of
+    each as fit (sizes and capacity in integer memory units)
+    '''
+    counts = np.zeros(len(sizes), dtype=np.int64)
+    remaining = int(capacity)
+    for index in order:
+        size = int(sizes[index])
+        take = int(quantities[index]) if size == 0 else min(int(quantities[index]), remaining//size)
+        if take > 0:
+            counts[index] = take
+            remaining -= take*size
+    return counts
+
+
+def split(quantities):
+    #binary splitting of the bounded quantities: (item, units) chunks, any count is a sum of chunks
+    chunks = []
+    for index, quantity in enumerate(quantities):
+        k = 1
+        quantity = int(quantity)
+        while quantity > 0:
+            take = min(k, quantity)
+            chunks.append((index, take))
+            quantity -= take
+            k *= 2
+    return chunks
+
+
+def dp(capacity, sizes, quantities, values, grid):
+    '''
+    best value over a memory grid of grid units, sizes rounded up to the grid
+    so the packing always fits (exact when the sizes are multiples of it)
+    '''
+    counts = np.zeros(len(sizes), dtype=np.int64)
+    cells = int(capacity)//grid
+    best = np.zeros(cells+1)
+    taken = []
+    chunks = []
+    for index, units in split(quantities):
+        weight = -(-int(sizes[index])//grid)*units
+        value = float(values[index])*units
+        if value <= 0 or weight > cells:
+            continue
+        if weight == 0:
+            counts[index] += units
+            continue
+        candidate = best[:cells+1-weight] + value
+        take = candidate > best[weight:]
+        best[weight:] = np.where(take, candidate, best[weight:])
+        taken.append(take)
+        chunks.append((index, units, weight))
+    cell = cells
+    for (index, units, weight), take in zip(reversed(chunks), reversed(taken)):
+        if cell >= weight and take[cell-weight]:
+            counts[index] += units
+            cell -= weight
+    return counts
+
+
+def fptas(capacity, sizes, quantities, values, eps, max_cells):
+    '''
+    (1-eps)-optimal packing: values scaled down to integers and the minimum
+    memory of every scaled value computed; the scale grows when the table
+    (a row of scaled values per chunk) would exceed max_cells, the packing is
+    then less close to the optimum
+    '''
+    counts = np.zeros(len(sizes), dtype=np.int64)
+    chunks = []
+    for index, units in split(quantities):
+        weight = int(sizes[index])*units
+        value = float(values[index])*units
+        if value <= 0 or weight > capacity:
+            continue
+        if weight == 0:
+            counts[index] += units
+            continue
+        chunks.append((index, units, weight, value))
+    if not chunks:
+        return counts
+    total = sum(chunk[3] for chunk in chunks)
+    scale = max(eps*max(chunk[3] for chunk in chunks)/len(chunks), total*len(chunks)/max_cells)
+    profits = [int(chunk[3]/scale) for chunk in chunks]
+    limit = sum(profits)
+    unreachable = np.iinfo(np.int64).max//2
+    lightest = np.full(limit+1, unreachable, dtype=np.int64)
+    lightest[0] = 0
+    taken = []
+    for (index, units, weight, value), profit in zip(chunks, profits):
+        if profit == 0:
+            taken.append(None)
+            continue
+        candidate = lightest[:limit+1-profit] + weight
+        take = candidate < lightest[profit:]
+        lightest[profit:] = np.where(take, candidate, lightest[profit:])
+        taken.append(take)
+    profit = int(np.flatnonzero(lightest <= capacity).max())
+    room = int(capacity)
+    for (index, units, weight, value), gain, take in zip(reversed(chunks), reversed(profits), reversed(taken)):
+        if take is not None and profit >= gain and take[profit-gain]:
+            counts[index] += units
+            profit -= gain
+            room -= weight
+    #the chunks scaled to no profit fill what is left
+    for (index, units, weight, value), take in zip(chunks, taken):
+        if take is None and weight <= room:
+            counts[index] += units
+            room -= weight
+    return counts
+
+
+class Packer:
+    '''
+    Bounded knapsack admission of keep-alive units into a pool of memory
+    capacity: each item (a candidate function) has a size, a number of units
+    and a value per unit. Modes
+    - greedy: the items in the given order (decreasing impact score), as the
+      original unit-by-unit packing
+    - dp: exact dynamic program over a memory grid of grid_mb MB
+    - fptas: (1-eps)-optimal dynamic program over scaled values (coarser
+      when its table would exceed max_cells)
+    - auto: dp while the table has at most max_cells cells, fptas otherwise
+    The packed value is reported against the greedy one.
+    '''
+    def __init__(self, mode="greedy", eps=0.05, grid_mb=1, max_cells=1<<24):
+        if mode not in MODES:
+            raise ValueError(f"unknown packer {mode}, choose from {list(MODES)}")
+        self.mode = mode
+        self.eps = eps
+        self.grid = max(1, int(grid_mb*MEM_UNIT//1000))
+        self.max_cells = max_cells
+        self.calls = 0
+        self.value = 0.0
+        self.greedy_value = 0.0
+        self.seconds = 0.0
+
+    def choose(self, capacity, quantities):
+        if self.mode != "auto":
+            return self.mode
+        cells = (int(capacity)//self.grid + 1)*len(split(quantities))
+        return "dp" if cells <= self.max_cells else "fptas"
+
+    def fits(self, capacity, cost):
+        '''
+        whether the memory cost (integer units) fits in capacity (GB), both
+        scalars or one per server
+        '''
+        capacity = np.vectorize(mem_units, otypes=[np.int64])(capacity)
+        return np.asarray(cost) <= capacity
+
+    def pack(self, capacity, sizes, quantities, values, order):
+        '''
+        units packed of every item (sizes and capacity in GB, values per unit)
+        '''
+        start = time.time()
+        capacity = mem_units(capacity)
+        sizes = np.array([mem_units(size) for size in sizes], dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        counts = greedy(capacity, sizes, quantities, order)
+        greedy_value = float(counts @ values)
+        mode = self.choose(capacity, quantities)
+        if mode != "greedy" and not np.array_equal(counts, quantities):
+            if mode == "dp":
+                packed = dp(capacity, sizes, quantities, values, self.grid)
+            else:
+                packed = fptas(capacity, sizes, quantities, values, self.eps, self.max_cells)
+            if float(packed @ values) > greedy_value:
+                counts = packed
+        self.calls += 1
+        self.value += float(counts @ values)
+        self.greedy_value += greedy_value
+        self.seconds += time.time()-start
+        return counts
+
+    def stats(self):
+        return {"mode": self.mode, "calls": self.calls, "value": self.value, "greedy_value": self.greedy_value,
+                "gain": self.value/self.greedy_value-1 if self.greedy_value else 0.0, "seconds": self.seconds}
@@ -0,0 +1,35 @@
+import multiprocessing as mp
+import numpy as np
+from profile_catalog import get_catalog
+
+# the task of the running pool, inherited by the forked workers
+_task = None
+
+
+def _run_shard(functions):
+    return [(i, _task(i)) for i in functions]
+
+
+def map_functions(task, function_num, workers=1, shards_per_worker=4):
+    '''
+    task(i) for every function index, sharded over a process pool.
+    The workers are forked, so task and everything it refers to (traces, CI,
+    profile catalog) are inherited instead of pickled; only the per-function
+    results travel back. Results are returned in function order.
+    '''
+    if workers <= 1 or function_num <= 1:
+        return [task(i) for i in range(function_num)]
+    global _task
+    # load the profiles before forking so that every worker shares them
+    get_catalog()
+    _task = task
+    shards = [shard.tolist() for shard in np.array_split(np.arange(function_num), workers*shards_per_worker) if len(shard)]
+    results = [None]*function_num
+    try:
+        with mp.get_context("fork").Pool(workers) as pool:
+            for part in pool.imap_unordered(_run_shard, shards):
+                for i, result in part:
+                    results[i] = result
+    finally:
+        _task = None
+    return results
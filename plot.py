@@ -1,4 +1,3 @@
-import json
 import sys
 import numpy as np
 import matplotlib
@@ -11,73 +10,34 @@ import sys
 sys.path.append("..") 
 import matplotlib.ticker as mtick
 import fire
-import utils
+import summary
+import trace_store
 
-def read_json_file(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-        return data
-    
 def verify(
     window_size: int=20,
     interval: int=24*60,
 ):
-    traces, trace_function_names,original_names = utils.read_selected_traces()
-    sum_invoke = 0
-    for j in range(window_size, window_size+interval):
-         for i in range(len(traces)):
-                if int(traces[i][j])!=0:
-                    sum_invoke+=int(traces[i][j])
-                    
-    #read the oracle results
-    oracle_carbon = read_json_file("./results/oracle/carbon.json")
-    oracle_st = read_json_file("./results/oracle/st.json")
-
-    sum_carbon_oracle = 0
-    sum_st_oracle =0
+    invocations = trace_store.invocation_totals(window_size, window_size+interval)
+    sum_invoke = int(invocations.sum())
 
-    for i in range(len(traces)):
-        sum_carbon_oracle+=np.sum(oracle_carbon[str(i)])
-        sum_st_oracle+=np.sum(oracle_st[str(i)])   
+    #read the oracle results
+    totals, _, _ = summary.summarize_run("./results/oracle", invocations)
+    sum_st_oracle, sum_carbon_oracle = totals["sum_st"], totals["sum_carbon"]
     print(f"Oracle AVG Carbon is:{sum_carbon_oracle/sum_invoke}, Oracle AVG Service Time is: {sum_st_oracle/sum_invoke}")
 
     #read the performance optimal results
-    perf_carbon = read_json_file("./results/service_time_opt/carbon.json")
-    perf_st = read_json_file("./results/service_time_opt/st.json")
-
-    sum_carbon_perf = 0
-    sum_st_perf =0
-
-    for i in range(len(traces)):
-        sum_carbon_perf+=np.sum(perf_carbon[str(i)])
-        sum_st_perf+=np.sum(perf_st[str(i)])
+    totals, _, _ = summary.summarize_run("./results/service_time_opt", invocations)
+    sum_st_perf, sum_carbon_perf = totals["sum_st"], totals["sum_carbon"]
     print(f"Performance Optimal AVG Carbon is:{sum_carbon_perf/sum_invoke}, Performance Optimal AVG Service Time is: {sum_st_perf/sum_invoke}")
 
     #read the carbon optimal results
-    carbon_carbon = read_json_file("./results/carbon_opt/carbon.json")
-    carbon_st = read_json_file("./results/carbon_opt/st.json")
-
-    sum_carbon_carbon = 0
-    sum_st_carbon =0
-
-    for i in range(len(traces)):
-        sum_carbon_carbon+=np.sum(carbon_carbon[str(i)])
-        sum_st_carbon+=np.sum(carbon_st[str(i)])
+    totals, _, _ = summary.summarize_run("./results/carbon_opt", invocations)
+    sum_st_carbon, sum_carbon_carbon = totals["sum_st"], totals["sum_carbon"]
     print(f"Carbon Optimal AVG Carbon is:{sum_carbon_carbon/sum_invoke}, Carbon Optimal AVG Service Time is: {sum_st_carbon/sum_invoke}")
     
     #read the eco-life results:
-    eco_carbon = read_json_file("./results/eco_life/carbon.json")
-    eco_st = read_json_file("./results/eco_life/st.json")
-    
-    sum_carbon_eco = 0
-    sum_st_eco =0
-    
-    for i in range(len(traces)):
-        for _,value in eco_carbon[i].items():
-            sum_carbon_eco += value["carbon"]
-        for _,value in eco_st[i].items():
-            sum_st_eco += value["st"]
-        
+    totals, _, _ = summary.summarize_run("./results/eco_life", invocations)
+    sum_st_eco, sum_carbon_eco = totals["sum_st"], totals["sum_carbon"]
     print(f"Eco-life AVG Carbon is:{sum_carbon_eco/sum_invoke}, Eco-life AVG Service Time is: {sum_st_eco/sum_invoke}")
     
     #plot
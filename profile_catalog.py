@@ -0,0 +1,78 @@
+from pathlib import Path
+import csv
+import json
+import numpy as np
+
+# fields of data/avg_data/{app}_{server}.metal.json
+PROFILE_FIELDS = ["cs", "cs_energy_cpu", "cs_energy_dram", "exe", "exe_energy_cpu", "exe_energy_dram"]
+# fields of server_info.json
+SERVER_FIELDS = ["core", "ec_cpu", "mem", "ec_ram", "cpu_idle_energy", "dram_idle_energy"]
+
+
+class ProfileCatalog:
+    '''
+    All the profiled data in memory: server specs, function memory sizes and
+    the avg profiles of every (app, server). Dense arrays are indexed by
+    app_index / server_index, the dicts are used by the scalar helpers in utils.
+    '''
+    def __init__(self, root=None):
+        root = Path(__file__).parents[0] if root is None else Path(root)
+        self.root = root
+        #function memory size
+        self.apps = []
+        app_mem = []
+        with open(f'{root}/function_mem.csv', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            for row in reader:
+                self.apps.append(row[0])
+                app_mem.append(float(row[1]))
+        self.app_index = {name: i for i, name in enumerate(self.apps)}
+        self.app_mem = np.array(app_mem)
+
+        #server info
+        with open(f'{root}/server_info.json', 'r') as file:
+            info = json.load(file)
+        self.servers = [x['name'] for x in info]
+        self.server_index = {name: i for i, name in enumerate(self.servers)}
+        self._server_info = {x['name']: x for x in info}
+        self.server = {field: np.array([float(x[field]) for x in info]) for field in SERVER_FIELDS}
+
+        #avg profiles, nan if the pair is not profiled
+        self.profile = {field: np.full((len(self.apps), len(self.servers)), np.nan) for field in PROFILE_FIELDS}
+        self._profiles = {}
+        for a, app in enumerate(self.apps):
+            for s, server in enumerate(self.servers):
+                path = Path(f'{root}/data/avg_data/{app}_{server}.metal.json')
+                if not path.exists():
+                    continue
+                with open(path, 'r') as data_file:
+                    data = json.load(data_file)[0]
+                self._profiles[(app, server)] = data
+                for field in PROFILE_FIELDS:
+                    self.profile[field][a, s] = data[field]
+
+    def func_mem_size(self, app):
+        return float(self.app_mem[self.app_index[app]])
+
+    def server_info(self, server):
+        return self._server_info[server]
+
+    def app_profile(self, app, server):
+        return self._profiles[(app, server)]
+
+    def app_indices(self, apps):
+        return np.array([self.app_index[app] for app in apps], dtype=int)
+
+    def server_indices(self, servers):
+        return np.array([self.server_index[server] for server in servers], dtype=int)
+
+
+_catalog = None
+
+
+def get_catalog():
+    #loaded once per process
+    global _catalog
+    if _catalog is None:
+        _catalog = ProfileCatalog()
+    return _catalog
@@ -1,6 +1,6 @@
 import numpy as np
 import random
-import utils
+from carbon_model import get_carbon_model
 class PSO:
     def __init__(self, parameters,server_pair,function_name,ci_avg,cur_ci,cur_interval):
         self.max_delta_ci = 0.1
@@ -12,7 +12,7 @@ class PSO:
         self.iteration = 1
         self.size = parameters[0]   
         self.var_num = 2
-        self.var_1 = [0,1]#kat
+        self.var_1 = list(range(len(server_pair)))#kat location
         self.var_2 = parameters[1]# choices of kat
         self.lam = parameters[2]#lamda to control service time
         self.server_pair = server_pair
@@ -22,26 +22,28 @@ class PSO:
         self.p_best = np.zeros((self.size, self.var_num))   # best partical loc
         self.g_best = np.zeros((1, self.var_num))   # globel partical loc
         self.function_name = function_name
+        self.model = get_carbon_model(servers=server_pair)
+        self.app = self.model.app_index[function_name]
+        self.kat_grid = np.arange(max(self.var_2)+1)
         # compute max:
-        old_cold,_ = utils.get_st(function_name, server_pair[0])
-        new_cold,_ = utils.get_st(function_name, server_pair[1])
-        cold_carbon_max,_= utils.compute_exe(function_name, server_pair,ci_avg)
-        self.max_st = max(old_cold, new_cold)
-        self.max_carbon_st = max(cold_carbon_max)
-        self.max_carbon_kat = max(utils.compute_kat(function_name, server_pair[0],7, ci_avg),utils.compute_kat(function_name, server_pair[1],7, ci_avg))
+        cold_carbon_max,_ = self.model.exe(ci_avg)
+        self.max_st = self.model.cold_st[self.app].max()
+        self.max_carbon_st = cold_carbon_max[self.app, :, 0].max()
+        self.max_carbon_kat = self.model.keepalive(7, ci_avg)[self.app, :, 0, 0].max()
         #self.first_ci = cur_ci
-        self.bound = [[0,0],[1,max(self.var_2)]]#setting bound
+        self.bound = [[0,0],[len(server_pair)-1,max(self.var_2)]]#setting bound
         temp = np.inf
         self.temp=0
         self.st_score = []
         self.carbon_score = []
+        table = self.fitness_table(cur_ci, cur_interval)
         for i in range(self.size):
             self.pop_x[i][0] = int(random.choice(self.var_1))
             self.pop_x[i][1] = int(random.choice(self.var_2))
             for j in range(self.var_num):
                 self.pop_v[i][j] = random.uniform(0, 1)
             self.p_best[i] = self.pop_x[i]  
-            fit = self.fitness(self.p_best[i], cur_ci,cur_interval)
+            fit = self.fitness_batch(self.p_best[i], table)
             # print("{} the score is {}".format(self.p_best[i], fit))
             if fit < temp:
                 self.g_best = self.p_best[i]
@@ -50,48 +52,45 @@ class PSO:
         
         
     def prob_cold(self, cur_interval, kat):
-        
+        #cold/warm probability for every kat in one go
+        kat = np.asarray(kat)
         if len(cur_interval)==0:
             #no invocation
-            return 0.5,0.5
-        else:
-            cold = 0
-            warm = 0
-            for interval in cur_interval:
-                if interval<=kat:
-                    #hit
-                    warm+=1
-                else:
-                    cold+=1
-            return cold/(cold+warm), warm/(cold+warm)
-            
-    def fitness(self,var,ci, past_interval):
-        var = var.astype(int)
-        ka_loc = var[0]
-        kat = var[1]
-        #kat carbon 
-        score = 0
-        old_kat_carbon = utils.compute_kat(self.function_name, self.server_pair[0],kat,ci)
-        new_kat_carbon = utils.compute_kat(self.function_name, self.server_pair[1],kat, ci)
-        cold_carbon,warm_carbon= utils.compute_exe(self.function_name, self.server_pair, ci)
-        
-        old_st = utils.get_st(self.function_name,self.server_pair[0])
-        new_st = utils.get_st(self.function_name,self.server_pair[1])
-        score += (1-self.lam) * (((1-ka_loc)*old_kat_carbon+ka_loc*new_kat_carbon)/self.max_carbon_kat)
-    
-        #print((1-self.lam) * (((1-ka_loc)*old_kat_carbon+ka_loc*new_kat_carbon)/self.max_carbon_kat))
-        # expectation for st and carbon_st
+            return np.full(kat.shape, 0.5), np.full(kat.shape, 0.5)
+        interval = np.asarray(cur_interval)
+        cold = (interval[None, :] > kat.reshape(-1, 1)).sum(axis=1).reshape(kat.shape)
+        warm = len(interval) - cold
+        return cold/len(interval), warm/len(interval)
 
-        cold_prob, warm_prob = self.prob_cold(past_interval,kat)
-        part_time_prob = cold_prob*((1-ka_loc)*old_st[0]+ ka_loc*new_st[0])+warm_prob*((1-ka_loc)*old_st[1]+ ka_loc*new_st[1])
-        part_carbon_prob = cold_prob*((1-ka_loc)*cold_carbon[0]+ ka_loc*cold_carbon[1])+warm_prob*((1-ka_loc)*warm_carbon[0]+ ka_loc*warm_carbon[1])
+    def fitness_table(self, ci, past_interval):
+        '''
+        score of every (ka_loc, kat) for the current ci and interval window,
+        computed once per step and looked up by fitness_batch
+        '''
+        kat_carbon = self.model.keepalive(self.kat_grid, ci)[self.app, :, :, 0]
+        cold_carbon, warm_carbon = self.model.exe(ci)
+        cold_carbon = cold_carbon[self.app, :, 0][:, None]
+        warm_carbon = warm_carbon[self.app, :, 0][:, None]
+        cold_st = self.model.cold_st[self.app][:, None]
+        warm_st = self.model.warm_st[self.app][:, None]
+        #ka_loc selects the row of the server
+        score = (1-self.lam) * (kat_carbon/self.max_carbon_kat)
+        # expectation for st and carbon_st
+        cold_prob, warm_prob = self.prob_cold(past_interval, self.kat_grid)
+        part_time_prob = cold_prob*cold_st+warm_prob*warm_st
+        part_carbon_prob = cold_prob*cold_carbon+warm_prob*warm_carbon
         score += self.lam*(part_time_prob)/self.max_st
         score += (1-self.lam)*(part_carbon_prob)/(self.max_carbon_st)
         return score
-        
-            
-        
- 
+
+    def fitness_batch(self, var, table):
+        #score a particle or a whole (n x 2) matrix of particles
+        var = np.asarray(var).astype(int)
+        return table[var[..., 0], var[..., 1]]
+
+    def fitness(self,var,ci, past_interval):
+        return self.fitness_batch(var, self.fitness_table(ci, past_interval))
+
     def update_operator(self,ci,past_interval,diff_ci,diff_fn):
         w_max = 1
         w_min = 0.5
@@ -115,6 +114,8 @@ class PSO:
             c2 = c2_min
         elif c2 > c2_max:
             c2 = c2_max
+        table = self.fitness_table(ci, past_interval)
+        p_best_fit = self.fitness_batch(self.p_best, table)
         for i in range(self.size):
             #update v
             #print("previous:{}".format(self.pop_x[i]))
@@ -134,9 +135,11 @@ class PSO:
                     self.pop_x[i][j] = self.bound[1][j]
             #print("current:{}".format(self.pop_x[i]))
             # update
-            if self.fitness(self.pop_x[i],ci,past_interval) < self.fitness(self.p_best[i],ci,past_interval):
+            fit = self.fitness_batch(self.pop_x[i], table)
+            if fit < p_best_fit[i]:
                 self.p_best[i] = self.pop_x[i]
-            if self.fitness(self.pop_x[i],ci,past_interval) < self.fitness(self.g_best,ci,past_interval):
+                p_best_fit[i] = fit
+            if fit < self.fitness_batch(self.g_best, table):
                 self.g_best = self.pop_x[i]
  
     def main(self,ci,past_interval):
@@ -0,0 +1,140 @@
+import glob
+import json
+import os
+import numpy as np
+import fire
+
+COLUMNS = ["function_id", "minute", "num", "st", "carbon"]
+DTYPES = {"function_id": np.int32, "minute": np.int32, "num": np.int32, "st": np.float64, "carbon": np.float64}
+META = "meta.json"
+
+
+class ResultWriter:
+    '''
+    Columnar results of one run: result_dir/part-<k>.npz chunks with the
+    columns function_id, minute, num, st and carbon, plus result_dir/meta.json.
+    One row per invoked minute of a function; with per_invocation (baselines)
+    st/carbon are the value of each of the num invocations, otherwise
+    (eco-life) the total of the minute. Rows are appended function by function,
+    or in batches of functions (eco-life with checkpoints), the readers sort them.
+    The previous results in result_dir are replaced; a resumed run keeps its
+    first parts (with their rows) and replaces the later ones.
+    '''
+    def __init__(self, result_dir, function_num, per_invocation, chunk_rows=1<<20, parts=0, rows=0):
+        self.result_dir = result_dir
+        self.function_num = function_num
+        self.per_invocation = per_invocation
+        self.chunk_rows = chunk_rows
+        os.makedirs(result_dir, exist_ok=True)
+        kept = {f"{result_dir}/part-{k:05d}.npz" for k in range(parts)}
+        for file in glob.glob(f"{result_dir}/part-*.npz") + [f"{result_dir}/{META}", f"{result_dir}/st.json", f"{result_dir}/carbon.json"]:
+            if os.path.exists(file) and file not in kept:
+                os.remove(file)
+        self.buffer = {column: [] for column in COLUMNS}
+        self.buffered = 0
+        self.parts = parts
+        self.rows = rows
+
+    def append(self, function_id, minute, num, st, carbon):
+        minute = np.asarray(minute)
+        self.buffer["function_id"].append(np.full(len(minute), function_id))
+        for column, value in zip(COLUMNS[1:], (minute, num, st, carbon)):
+            self.buffer[column].append(np.asarray(value))
+        self.buffered += len(minute)
+        if self.buffered >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        columns = {column: np.concatenate(value).astype(DTYPES[column]) for column, value in self.buffer.items()}
+        np.savez(f"{self.result_dir}/part-{self.parts:05d}.npz", **columns)
+        self.buffer = {column: [] for column in COLUMNS}
+        self.rows += self.buffered
+        self.buffered = 0
+        self.parts += 1
+
+    def close(self):
+        self.flush()
+        meta = {"columns": COLUMNS, "function_num": self.function_num, "per_invocation": self.per_invocation,
+                "parts": self.parts, "rows": self.rows}
+        with open(f"{self.result_dir}/{META}", "w") as file:
+            json.dump(meta, file, indent=4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def exists(result_dir):
+    return os.path.exists(f"{result_dir}/{META}")
+
+
+def read_meta(result_dir):
+    with open(f"{result_dir}/{META}", "r") as file:
+        return json.load(file)
+
+
+def iter_chunks(result_dir):
+    #one dict of columns per part, in write order
+    for k in range(read_meta(result_dir)["parts"]):
+        with np.load(f"{result_dir}/part-{k:05d}.npz") as part:
+            yield {column: part[column] for column in COLUMNS}
+
+
+def read_results(result_dir):
+    chunks = list(iter_chunks(result_dir))
+    if not chunks:
+        return {column: np.zeros(0, dtype=DTYPES[column]) for column in COLUMNS}
+    return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in COLUMNS}
+
+
+def totals(result_dir):
+    '''
+    number of invocations and total st / carbon of a run
+    '''
+    per_invocation = read_meta(result_dir)["per_invocation"]
+    invocations, sum_st, sum_carbon = 0, 0.0, 0.0
+    for chunk in iter_chunks(result_dir):
+        num = chunk["num"].astype(np.int64)
+        invocations += int(num.sum())
+        weight = num if per_invocation else 1
+        sum_st += float(np.sum(chunk["st"]*weight))
+        sum_carbon += float(np.sum(chunk["carbon"]*weight))
+    return invocations, sum_st, sum_carbon
+
+
+def export_json(result_dir):
+    '''
+    write st.json/carbon.json of result_dir in the original layout:
+    per function lists of per invocation values for the baselines, per
+    function {minute: {"num", "st"/"carbon"}} for eco-life
+    '''
+    meta = read_meta(result_dir)
+    data = read_results(result_dir)
+    order = np.lexsort((data["minute"], data["function_id"]))
+    data = {column: value[order] for column, value in data.items()}
+    function_num = meta["function_num"]
+    bounds = np.searchsorted(data["function_id"], np.arange(function_num+1))
+    result_st, result_carbon = ({}, {}) if meta["per_invocation"] else ([], [])
+    for i in range(function_num):
+        rows = slice(bounds[i], bounds[i+1])
+        num = data["num"][rows]
+        if meta["per_invocation"]:
+            result_st[i] = np.repeat(data["st"][rows], num).tolist()
+            result_carbon[i] = np.repeat(data["carbon"][rows], num).tolist()
+        else:
+            minutes, num = data["minute"][rows].tolist(), num.tolist()
+            result_st.append({m: {"num": n, "st": v} for m, n, v in zip(minutes, num, data["st"][rows].tolist())})
+            result_carbon.append({m: {"num": n, "carbon": v} for m, n, v in zip(minutes, num, data["carbon"][rows].tolist())})
+    with open(f"{result_dir}/st.json", "w") as file:
+        json.dump(result_st, file, indent=4)
+    with open(f"{result_dir}/carbon.json", "w") as file:
+        json.dump(result_carbon, file, indent=4)
+
+
+if __name__ == "__main__":
+    fire.Fire({"export_json": export_json, "totals": totals})
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+import fire
+import result_store
+import trace_store
+
+
+class RunSummary:
+    '''
+    Streaming aggregation of the result chunks of one run: totals, per
+    function and per hour sums of the invocations, service time and carbon.
+    Only the (functions) and (hours) accumulators are kept, so memory does not
+    grow with the length of the run.
+    '''
+    def __init__(self, function_num, per_invocation):
+        self.per_invocation = per_invocation
+        self.function = {column: np.zeros(function_num) for column in ("num", "st", "carbon")}
+        self.hour = {column: np.zeros(0) for column in ("num", "st", "carbon")}
+
+    def update(self, chunk):
+        num = chunk["num"].astype(np.int64)
+        weight = num if self.per_invocation else 1
+        values = {"num": num, "st": chunk["st"]*weight, "carbon": chunk["carbon"]*weight}
+        hour = chunk["minute"]//60
+        hours = int(hour.max())+1 if len(hour) else 0
+        for column, value in values.items():
+            self.function[column] += np.bincount(chunk["function_id"], weights=value, minlength=len(self.function[column]))
+            per_hour = np.bincount(hour, weights=value, minlength=hours)
+            if len(per_hour) > len(self.hour[column]):
+                self.hour[column] = np.pad(self.hour[column], (0, len(per_hour)-len(self.hour[column])))
+            self.hour[column][:len(per_hour)] += per_hour
+
+    def per_function(self, invocations=None):
+        table = pd.DataFrame({"invocations": self.function["num"].astype(np.int64),
+                              "sum_st": self.function["st"], "sum_carbon": self.function["carbon"]})
+        if invocations is not None:
+            table["invocations"] = invocations
+        table["avg_st"] = table["sum_st"]/table["invocations"]
+        table["avg_carbon"] = table["sum_carbon"]/table["invocations"]
+        table.index.name = "function_id"
+        return table
+
+    def per_hour(self):
+        table = pd.DataFrame({"invocations": self.hour["num"].astype(np.int64),
+                              "sum_st": self.hour["st"], "sum_carbon": self.hour["carbon"]})
+        table = table[table["invocations"] > 0]
+        table["avg_st"] = table["sum_st"]/table["invocations"]
+        table["avg_carbon"] = table["sum_carbon"]/table["invocations"]
+        table.index.name = "hour"
+        return table
+
+
+def summarize_run(result_dir, invocations=None):
+    '''
+    stream the chunks of result_dir; invocations (per function) defaults to
+    the invocations recorded in the results
+    '''
+    meta = result_store.read_meta(result_dir)
+    summary = RunSummary(meta["function_num"], meta["per_invocation"])
+    for chunk in result_store.iter_chunks(result_dir):
+        summary.update(chunk)
+    per_function = summary.per_function(invocations)
+    sum_invoke = int(per_function["invocations"].sum())
+    sum_st, sum_carbon = per_function["sum_st"].sum(), per_function["sum_carbon"].sum()
+    totals = {"invocations": sum_invoke, "sum_st": sum_st, "sum_carbon": sum_carbon,
+              "avg_st": sum_st/sum_invoke, "avg_carbon": sum_carbon/sum_invoke}
+    return totals, per_function, summary.per_hour()
+
+
+def summarize(
+    result_dirs: list=["./results/oracle", "./results/service_time_opt", "./results/carbon_opt", "./results/eco_life"],
+    window_size: int=20,
+    interval: int=24*60,
+    write: bool=False,
+):
+    '''
+    averages of each run over the invocations of [window_size, window_size+interval)
+    with write, per_function.csv and per_hour.csv are saved in each result dir
+    '''
+    invocations = trace_store.invocation_totals(window_size, window_size+interval)
+    rows = []
+    for result_dir in ([result_dirs] if isinstance(result_dirs, str) else result_dirs):
+        if not result_store.exists(result_dir):
+            print(f"no results in {result_dir}")
+            continue
+        totals, per_function, per_hour = summarize_run(result_dir, invocations)
+        rows.append({"run": os.path.basename(os.path.normpath(result_dir)), **totals})
+        if write:
+            per_function.to_csv(f"{result_dir}/per_function.csv")
+            per_hour.to_csv(f"{result_dir}/per_hour.csv")
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    fire.Fire(summarize)
@@ -0,0 +1,208 @@
+import numpy as np
+import random
+from carbon_model import get_carbon_model
+import decision_cache
+
+
+class SwarmBank:
+    '''
+    The DPSO swarms of all functions in struct-of-arrays form
+    (functions x particles x 2). It follows pso.PSO step by step: random numbers
+    are drawn from `random` / `np.random` in the same order as one PSO object
+    per function would, so decisions match pso.PSO under a fixed seed, while the
+    velocity/position update and the fitness run vectorized over the functions.
+    Like pso.PSO, g_best refers to a particle row (of p_best or pop_x) instead
+    of holding a copy, so it follows the row when that particle moves.
+    '''
+    #g_best refers to a row of
+    P_BEST = 0
+    POP_X = 1
+
+    def __init__(self, function_names, server_pair, kat_time, st_lambda, ci_avg, size, fitness_cache=None):
+        self.size = size
+        #decision_cache.LRUCache of fitness rows, or None
+        self.fitness_cache = fitness_cache
+        self.var_num = 2
+        self.var_1 = list(range(len(server_pair)))#kat location
+        self.var_2 = kat_time# choices of kat
+        self.lam = st_lambda
+        self.model = get_carbon_model(servers=server_pair)
+        self.app = np.array([self.model.app_index[name] for name in function_names], dtype=int)
+        self.kat_grid = np.arange(max(self.var_2)+1)
+        self.bound = np.array([[0,0],[len(server_pair)-1,max(self.var_2)]])#setting bound
+        function_num = len(function_names)
+
+        self.pop_x = np.zeros((function_num, size, self.var_num))    # partical loc
+        self.pop_v = np.zeros((function_num, size, self.var_num))    # partical v
+        self.p_best = np.zeros((function_num, size, self.var_num))   # best partical loc
+        self.g_kind = np.zeros(function_num, dtype=int)
+        self.g_index = np.zeros(function_num, dtype=int)
+        self.created = np.zeros(function_num, dtype=bool)
+        self.max_delta_ci = np.full(function_num, 0.1)
+        self.prev_ci = np.zeros(function_num)
+        self.max_delta_fn = np.full(function_num, 0.1)
+        self.prev_fn = np.zeros(function_num, dtype=int)
+
+        # compute max:
+        cold_carbon, _ = self.model.exe(ci_avg)
+        kat_carbon = self.model.keepalive(7, ci_avg)
+        self.max_st = self.model.cold_st[self.app].max(axis=1)
+        self.max_carbon_st = cold_carbon[self.app, :, 0].max(axis=1)
+        self.max_carbon_kat = kat_carbon[self.app, :, 0, 0].max(axis=1)
+
+    STATE = ("pop_x", "pop_v", "p_best", "g_kind", "g_index", "created", "max_delta_ci", "prev_ci", "max_delta_fn", "prev_fn")
+
+    def state(self):
+        #the swarm arrays, the fitness cache is saved by its owner
+        return {key: getattr(self, key) for key in self.STATE}
+
+    def restore(self, state):
+        for key in self.STATE:
+            setattr(self, key, state[key])
+
+    def fitness_table(self, functions, ci, cold, n_interval, kat_ci=None):
+        '''
+        score of every (ka_loc, kat), (functions x servers x kat)
+        kat_ci: expected mean ci over each keep alive (kat), the keep alive
+        carbon is charged at ci when it is not given
+        With a fitness cache, the rows of functions seen with the same exact
+        inputs are reused
+        '''
+        if self.fitness_cache is None:
+            return self._fitness_table(functions, ci, cold, n_interval, kat_ci)
+        cache_keys = decision_cache.keys(functions, ci, cold, n_interval, kat_ci)
+        rows = [self.fitness_cache.get(key) for key in cache_keys]
+        miss = [n for n, row in enumerate(rows) if row is None]
+        if miss:
+            table = self._fitness_table(functions[miss], ci, cold[miss], n_interval[miss], kat_ci)
+            for n, row in zip(miss, table):
+                rows[n] = row
+                self.fitness_cache.put(cache_keys[n], row)
+        return np.stack(rows)
+
+    def _fitness_table(self, functions, ci, cold, n_interval, kat_ci):
+        app = self.app[functions]
+        if kat_ci is None:
+            kat_carbon = self.model.keepalive(self.kat_grid, ci)[app, :, :, 0]
+        else:
+            kat_carbon = self.model.keepalive_pairs(self.kat_grid, kat_ci)[app]
+        cold_carbon, warm_carbon = self.model.exe(ci)
+        cold_carbon = cold_carbon[app, :, 0][..., None]
+        warm_carbon = warm_carbon[app, :, 0][..., None]
+        cold_st = self.model.cold_st[app][..., None]
+        warm_st = self.model.warm_st[app][..., None]
+        score = (1-self.lam) * (kat_carbon/self.max_carbon_kat[functions][:, None, None])
+        # expectation for st and carbon_st
+        has_interval = (n_interval > 0)[:, None]
+        n = np.maximum(n_interval, 1)[:, None]
+        cold_prob = np.where(has_interval, cold/n, 0.5)[:, None, :]
+        warm_prob = np.where(has_interval, (n_interval[:, None]-cold)/n, 0.5)[:, None, :]
+        part_time_prob = cold_prob*cold_st+warm_prob*warm_st
+        part_carbon_prob = cold_prob*cold_carbon+warm_prob*warm_carbon
+        score += self.lam*(part_time_prob)/self.max_st[functions][:, None, None]
+        score += (1-self.lam)*(part_carbon_prob)/(self.max_carbon_st[functions][:, None, None])
+        return score
+
+    def _g_rows(self, g_kind, g_index, p_best, pop_x):
+        rows = np.arange(len(g_kind))
+        return np.where((g_kind == self.P_BEST)[:, None], p_best[rows, g_index], pop_x[rows, g_index])
+
+    def g_best(self, functions):
+        return self._g_rows(self.g_kind[functions], self.g_index[functions], self.p_best[functions], self.pop_x[functions])
+
+    def _lookup(self, table, var):
+        #fitness of one particle (functions x 2) or all of them (functions x particles x 2)
+        var = var.astype(int)
+        rows = np.arange(len(table)).reshape((-1,) + (1,)*(var.ndim-2))
+        return table[rows, var[..., 0], var[..., 1]]
+
+    def _create(self, f, table):
+        for i in range(self.size):
+            self.pop_x[f, i, 0] = int(random.choice(self.var_1))
+            self.pop_x[f, i, 1] = int(random.choice(self.var_2))
+            for j in range(self.var_num):
+                self.pop_v[f, i, j] = random.uniform(0, 1)
+        self.p_best[f] = self.pop_x[f]
+        var = self.p_best[f].astype(int)
+        fit = table[var[:, 0], var[:, 1]]
+        self.g_kind[f] = self.P_BEST
+        self.g_index[f] = np.argmin(fit)
+        self.created[f] = True
+
+    def step(self, functions, ci, cold, n_interval, kat_ci=None):
+        '''
+        advance the swarms of the invoked functions (ascending order) by one
+        PSO.main call, returns their g_best (functions x 2)
+        '''
+        functions = np.asarray(functions, dtype=int)
+        if len(functions) == 0:
+            return np.zeros((0, self.var_num))
+        table = self.fitness_table(functions, ci, cold, n_interval, kat_ci)
+        new = ~self.created[functions]
+        #first invoke: the swarm starts at the current ci and interval
+        self.prev_ci[functions[new]] = ci
+        self.prev_fn[functions[new]] = n_interval[new]
+        diff_ci = np.abs(ci-self.prev_ci[functions])
+        diff_fn = np.abs(n_interval-self.prev_fn[functions])
+        reinit = (diff_fn/self.max_delta_fn[functions] != 0) | (diff_ci/self.max_delta_ci[functions] > 0)
+
+        #random numbers, drawn function by function as pso.PSO does
+        half = int(self.size/2)
+        r = np.empty((len(functions), 4*self.size))
+        for n, f in enumerate(functions):
+            if new[n]:
+                self._create(f, table[n])
+            half_indices = np.random.choice(half, half, replace=False)
+            if reinit[n]:
+                for index in half_indices:
+                    i = half_indices[index]
+                    self.pop_x[f, i, 0] = int(random.choice(self.var_1))
+                    self.pop_x[f, i, 1] = int(random.choice(self.var_2))
+            r[n] = [random.random() for _ in range(4*self.size)]
+        self.pop_v[functions] = r[:, :2*self.size].reshape(len(functions), self.size, self.var_num)
+        r1 = r[:, 2*self.size::2]
+        r2 = r[:, 2*self.size+1::2]
+
+        #update operator
+        w_max = 1
+        w_min = 0.5
+        c1_max = 1
+        c1_min = 0.3
+        c2_max = 1
+        c2_min = 0.3
+        delta = diff_fn/self.max_delta_fn[functions]+diff_ci/self.max_delta_ci[functions]
+        w = np.clip(w_max*delta, w_min, w_max)[:, None]
+        c1 = np.clip(c1_max*(1-delta), c1_min, c1_max)
+        c2 = np.clip(c2_max*(1-delta), c2_min, c2_max)
+        pop_x = self.pop_x[functions]
+        pop_v = self.pop_v[functions]
+        p_best = self.p_best[functions]
+        p_best_fit = self._lookup(table, p_best)
+        g_kind = self.g_kind[functions]
+        g_index = self.g_index[functions]
+        for i in range(self.size):
+            g_best = self._g_rows(g_kind, g_index, p_best, pop_x)
+            pop_v[:, i] = w*pop_v[:, i] + (c1*r1[:, i])[:, None]*(p_best[:, i]-pop_x[:, i]) + (c2*r2[:, i])[:, None]*(g_best-pop_x[:, i])
+            pop_x[:, i] = (pop_x[:, i] + pop_v[:, i]).astype(int)
+            # boundary
+            pop_x[:, i] = np.minimum(np.maximum(pop_x[:, i], self.bound[0]), self.bound[1])
+            # update
+            fit = self._lookup(table, pop_x[:, i])
+            better = fit < p_best_fit[:, i]
+            p_best[better, i] = pop_x[better, i]
+            p_best_fit[better, i] = fit[better]
+            g_best = self._g_rows(g_kind, g_index, p_best, pop_x)
+            better = fit < self._lookup(table, g_best)
+            g_kind[better] = self.POP_X
+            g_index[better] = i
+        self.pop_x[functions] = pop_x
+        self.pop_v[functions] = pop_v
+        self.p_best[functions] = p_best
+        self.g_kind[functions] = g_kind
+        self.g_index[functions] = g_index
+
+        self.max_delta_ci[functions] = np.maximum(self.max_delta_ci[functions], diff_ci)
+        self.max_delta_fn[functions] = np.maximum(self.max_delta_fn[functions], diff_fn)
+        self.prev_ci[functions] = ci
+        self.prev_fn[functions] = n_interval
+        return self.g_best(functions)
@@ -0,0 +1,169 @@
+import itertools
+import json
+import os
+import random
+import zlib
+import multiprocessing as mp
+from pathlib import Path
+import fire
+import numpy as np
+import pandas as pd
+import utils
+import result_store
+from main import run_optimizer
+from profile_catalog import get_catalog
+from carbon_model import get_carbon_model
+
+REGIONS = ["US-CAL", "US-FLA", "US-NY", "US-TEN", "US-TEX"]
+# the parameters each optimizer depends on, the others are not swept for it
+PARAMETERS = {
+    "perf_opt": ["region", "server_pair"],
+    "carbon_opt": ["region", "server_pair"],
+    "oracle": ["region", "server_pair", "STlambda"],
+    "eco-life": ["region", "server_pair", "STlambda", "mem_old", "mem_new", "pso_size"],
+}
+
+# the run level settings of a sweep, results of other settings are not reused
+SETTINGS = "sweep.json"
+# data shared with the forked workers
+_shared = {}
+
+
+def _as_list(value):
+    #fire passes "a,b" unparsed when the items are not python literals
+    if isinstance(value, str):
+        return value.split(",")
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def config_name(config):
+    parts = [config["optimizer"]]
+    for key in PARAMETERS[config["optimizer"]]:
+        value = config[key]
+        parts.append(f"{key}={'-'.join(value) if isinstance(value, (list, tuple)) else value}")
+    return "_".join(parts)
+
+
+def summarize(result_dir):
+    '''
+    average service time / carbon of one run from its result files
+    '''
+    invocations, sum_st, sum_carbon = result_store.totals(result_dir)
+    return {"invocations": invocations,
+            "avg_st": sum_st/invocations if invocations else float("nan"),
+            "avg_carbon": sum_carbon/invocations if invocations else float("nan")}
+
+
+def settings(config):
+    #everything the results of config depend on
+    return {key: config[key] for key in ["optimizer", *PARAMETERS[config["optimizer"]], "start_hour", "interval", "window_size", "kat_time", "seed"]}
+
+
+def done(config):
+    '''
+    whether result_dir holds the results of config (run with the same
+    settings, start_hour, interval, window_size, kat_time and seed included)
+    '''
+    path = f"{config['result_dir']}/{SETTINGS}"
+    if not result_store.exists(config["result_dir"]) or not os.path.exists(path):
+        return False
+    with open(path, "r") as file:
+        return json.load(file) == settings(config)
+
+
+def _run(config):
+    #forked workers would share the random state of the parent, each
+    #configuration gets its own seed (crc32 of its name, stable across runs)
+    seed = None if config["seed"] is None else (config["seed"]+zlib.crc32(config["name"].encode())) % 2**32
+    random.seed(seed)
+    np.random.seed(seed)
+    ci, ci_max, ci_min, ci_avg = _shared["ci"][config["region"]]
+    run_optimizer(config["optimizer"], _shared["traces"], _shared["trace_function_names"], _shared["function_mem_trace"],
+                  ci, ci_max, ci_avg, config["region"], _shared["interval"], config["mem_old"], config["mem_new"],
+                  config["server_pair"], _shared["kat_time"], config["STlambda"], _shared["window_size"],
+                  config["pso_size"], 1, config["result_dir"], quiet=_shared["quiet"])
+    with open(f"{config['result_dir']}/{SETTINGS}", "w") as file:
+        json.dump(settings(config), file, indent=4)
+    return config["name"], summarize(config["result_dir"])
+
+
+def sweep(
+    optimizer=["eco-life"],
+    region=REGIONS,
+    STlambda=[0.5],
+    mem_old=[512],
+    mem_new=[512],
+    server_pair=[['i3','m5zn']],
+    pso_size=[15],
+    start_hour: int=800,
+    interval: int=12*24*60,
+    window_size: int=20,
+    kat_time: list=[i for i in range(0,31)],
+    workers: int=1,
+    seed: int=0,
+    out_dir: str=None,
+):
+    '''
+    run every configuration of the grid once, loading the traces and the carbon
+    intensity of the regions a single time; configurations whose results
+    already exist with the same settings are skipped. Each configuration is
+    seeded from seed and its name (None: unseeded). Writes <out_dir>/summary.csv
+    '''
+    out_dir = f"{Path(__file__).parents[0]}/results/sweep" if out_dir is None else out_dir
+    server_pair = server_pair if isinstance(server_pair[0], (list, tuple)) else [_as_list(server_pair)]
+    grid = {"optimizer": _as_list(optimizer), "region": _as_list(region), "STlambda": _as_list(STlambda),
+            "mem_old": _as_list(mem_old), "mem_new": _as_list(mem_new), "server_pair": [list(x) for x in server_pair],
+            "pso_size": _as_list(pso_size)}
+    configs = {}
+    for values in itertools.product(*grid.values()):
+        config = dict(zip(grid.keys(), values))
+        if config["optimizer"] not in PARAMETERS:
+            raise ValueError(f"unknown optimizer {config['optimizer']}")
+        config.update(start_hour=start_hour, interval=interval, window_size=window_size, kat_time=[int(k) for k in kat_time], seed=seed)
+        config["name"] = config_name(config)
+        config["result_dir"] = f"{out_dir}/{config['name']}"
+        configs.setdefault(config["name"], config)
+    configs = list(configs.values())
+
+    #load everything once, the workers inherit it
+    traces, trace_function_names, _ = utils.read_selected_traces()
+    _shared.update(traces=traces, trace_function_names=trace_function_names,
+                   function_mem_trace=[utils.read_func_mem_size(name) for name in trace_function_names],
+                   ci={r: utils.load_carbon_intensity(r, start_hour, window_size+interval) for r in grid["region"]},
+                   interval=interval, window_size=window_size, kat_time=kat_time, quiet=workers > 1)
+    get_catalog()
+    for pair in grid["server_pair"]:
+        get_carbon_model(servers=pair)
+
+    summary = {}
+    pending = []
+    for config in configs:
+        if done(config):
+            print(f"skip {config['name']}, results exist")
+            summary[config["name"]] = summarize(config["result_dir"])
+        else:
+            pending.append(config)
+    if workers > 1 and len(pending) > 1:
+        with mp.get_context("fork").Pool(workers) as pool:
+            for name, row in pool.imap_unordered(_run, pending):
+                summary[name] = row
+    else:
+        for config in pending:
+            name, row = _run(config)
+            summary[name] = row
+
+    rows = []
+    for config in configs:
+        #parameters the optimizer does not use are left empty
+        row = {key: config[key] if key in PARAMETERS[config["optimizer"]] else None for key in PARAMETERS["eco-life"]}
+        row = {"optimizer": config["optimizer"], **row, "server_pair": "-".join(config["server_pair"])}
+        row.update(summary[config["name"]])
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    os.makedirs(out_dir, exist_ok=True)
+    table.to_csv(f"{out_dir}/summary.csv", index=False)
+    print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    fire.Fire(sweep)
@@ -0,0 +1,129 @@
+import csv
+import json
+import random
+import numpy as np
+import pytest
+import utils
+import result_store
+from benchmark import synthetic_traces
+from metrics import Metrics
+from optimizers import tech
+
+WINDOW = 20
+INTERVAL = 120
+START_HOUR = 800
+
+
+class Crash(Exception):
+    pass
+
+
+def make(traces, names, result_dir, metrics_out=None, flush_every=100, **kwargs):
+    #eco-life under memory pressure, seeded
+    random.seed(0)
+    np.random.seed(0)
+    ci, ci_max, _, _ = utils.load_carbon_intensity("US-CAL", START_HOUR, WINDOW+INTERVAL)
+    function_mem_trace = [utils.read_func_mem_size(name) for name in names]
+    metrics = Metrics(INTERVAL, out=metrics_out, every=10, quiet=True, flush_every=flush_every, append=kwargs.get("resume", False))
+    return tech.tech(traces, names, ['i3','m5zn'], list(range(31)), 0.5, ci, WINDOW, 0.3, 0.5, ci_max, function_mem_trace,
+                     5, "US-CAL", INTERVAL, str(result_dir), metrics=metrics, start_hour=START_HOUR, **kwargs)
+
+
+def results(result_dir):
+    data = result_store.read_results(str(result_dir))
+    order = np.lexsort((data["minute"], data["function_id"]))
+    return {column: value[order] for column, value in data.items()}
+
+
+@pytest.fixture(scope="module")
+def trace():
+    traces, names, _ = synthetic_traces(12, WINDOW+INTERVAL, rate=1.0, burstiness=1.0, period=30)
+    return traces, names
+
+
+def test_resume_after_crash_is_identical(trace, tmp_path, monkeypatch):
+    traces, names = trace
+    make(traces, names, tmp_path/"full").optimize()
+
+    execute = tech.tech.execute
+
+    def crashing(self, j, functions):
+        if j > WINDOW+70:
+            raise Crash()
+        return execute(self, j, functions)
+    monkeypatch.setattr(tech.tech, "execute", crashing)
+    with pytest.raises(Crash):
+        make(traces, names, tmp_path/"resumed", checkpoint_every=15).optimize()
+    monkeypatch.setattr(tech.tech, "execute", execute)
+    assert not result_store.exists(str(tmp_path/"resumed"))
+    #the rng is restored from the checkpoint, not from the seed
+    random.seed(1)
+    make(traces, names, tmp_path/"resumed", checkpoint_every=15, resume=True).optimize()
+
+    full, resumed = results(tmp_path/"full"), results(tmp_path/"resumed")
+    for column in result_store.COLUMNS:
+        assert np.array_equal(full[column], resumed[column]), column
+    assert not (tmp_path/"resumed"/"checkpoints").exists()
+
+
+def records(path):
+    #the metrics records without their wall time
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file)) if str(path).endswith(".csv") else [json.loads(line) for line in file]
+    return [{key: value for key, value in row.items() if key != "wall_s"} for row in rows]
+
+
+@pytest.mark.parametrize("fmt,flush_every", [("jsonl", 1), ("csv", 1), ("jsonl", 100)])
+def test_resume_keeps_metrics_records_once(trace, tmp_path, monkeypatch, fmt, flush_every):
+    #the records written between the checkpoint and the crash are dropped on
+    #resume, the buffered ones before the checkpoint were written by it
+    traces, names = trace
+    make(traces, names, tmp_path/"full", metrics_out=tmp_path/f"full.{fmt}").optimize()
+
+    execute = tech.tech.execute
+
+    def crashing(self, j, functions):
+        if j > WINDOW+70:
+            raise Crash()
+        return execute(self, j, functions)
+    monkeypatch.setattr(tech.tech, "execute", crashing)
+    with pytest.raises(Crash):
+        make(traces, names, tmp_path/"resumed", metrics_out=tmp_path/f"resumed.{fmt}", flush_every=flush_every,
+             checkpoint_every=15).optimize()
+    monkeypatch.setattr(tech.tech, "execute", execute)
+    make(traces, names, tmp_path/"resumed", metrics_out=tmp_path/f"resumed.{fmt}", flush_every=flush_every,
+         checkpoint_every=15, resume=True).optimize()
+    assert records(tmp_path/f"resumed.{fmt}") == records(tmp_path/f"full.{fmt}")
+
+
+def test_resume_rejects_other_configuration(trace, tmp_path, monkeypatch):
+    traces, names = trace
+    execute = tech.tech.execute
+
+    def crashing(self, j, functions):
+        if j > WINDOW+40:
+            raise Crash()
+        return execute(self, j, functions)
+    monkeypatch.setattr(tech.tech, "execute", crashing)
+    with pytest.raises(Crash):
+        make(traces, names, tmp_path, checkpoint_every=15).optimize()
+    monkeypatch.setattr(tech.tech, "execute", execute)
+    optimizer = make(traces, names, tmp_path, checkpoint_every=15, resume=True)
+    optimizer.start_hour = START_HOUR+1
+    with pytest.raises(ValueError):
+        optimizer.optimize()
+
+
+def test_profiler_unpatched_after_crash(trace, tmp_path, monkeypatch):
+    traces, names = trace
+    execute = tech.tech.execute
+    compute_kat = utils.compute_kat
+
+    def crashing(self, j, functions):
+        if j > WINDOW+10:
+            raise Crash()
+        return execute(self, j, functions)
+    monkeypatch.setattr(tech.tech, "execute", crashing)
+    with pytest.raises(Crash):
+        make(traces, names, tmp_path, profile=True).optimize()
+    assert utils.compute_kat is compute_kat
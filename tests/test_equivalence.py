@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import pytest
+import utils
+import result_store
+from benchmark import synthetic_traces
+from main import run_optimizer
+
+WINDOW = 20
+INTERVAL = 180
+SERVER_PAIR = ['i3','m5zn']
+TRACES = {
+    "flat": dict(rate=0.5),
+    "bursty": dict(rate=2.0, burstiness=1.0, period=30, seed=1),
+    "sparse": dict(rate=0.05, spread=2.0, seed=2),
+}
+# (invocations, total st, total carbon) of the original implementation on
+# the synthetic traces, eco-life seeded with 0 on two servers with its memory
+# (mem_old, mem_new) unbounded or under pressure. The original perf_opt fails
+# on sparse (a function with a single invocation), its value is the fixed one
+EXPECTED = {
+    ("flat", "perf_opt", None): (1213, 4362.788063, 48.39345681953545),
+    ("flat", "carbon_opt", None): (1213, 5760.264299, 38.67689994627848),
+    ("flat", "oracle", None): (1213, 4808.856758, 40.307005382601396),
+    ("flat", "eco-life", (512, 512)): (1213, 6146.717603, 52.34576362377261),
+    ("flat", "eco-life", (0.3, 0.5)): (1213, 6506.999102, 52.907854993162104),
+    ("flat", "eco-life", (0.1, 2)): (1213, 6157.178527, 52.399642692737096),
+    ("bursty", "perf_opt", None): (4233, 16832.835181, 161.30741284559704),
+    ("bursty", "carbon_opt", None): (4233, 20461.261226, 102.15524181810176),
+    ("bursty", "oracle", None): (4233, 17346.466402, 106.24232821086179),
+    ("bursty", "eco-life", (512, 512)): (4233, 25335.467093, 196.93716514009685),
+    ("bursty", "eco-life", (0.3, 0.5)): (4233, 27647.499601, 200.89512389962488),
+    ("bursty", "eco-life", (0.1, 2)): (4233, 26440.183898, 197.76239616596155),
+    ("sparse", "perf_opt", None): (493, 2107.67168, 19.76677625825684),
+    ("sparse", "carbon_opt", None): (493, 2595.920845, 13.834759812987834),
+    ("sparse", "oracle", None): (493, 2365.117505, 14.407248824550969),
+    ("sparse", "eco-life", (512, 512)): (493, 2841.083217, 19.990907581894934),
+    ("sparse", "eco-life", (0.3, 0.5)): (493, 2841.083217, 19.941421228618573),
+    ("sparse", "eco-life", (0.1, 2)): (493, 2840.928685, 19.939758318008707),
+}
+
+
+@pytest.fixture(scope="module")
+def carbon_intensity():
+    return utils.load_carbon_intensity("US-CAL", 800, WINDOW+INTERVAL)
+
+
+@pytest.mark.parametrize("trace,optimizer,mem", list(EXPECTED))
+def test_matches_original(carbon_intensity, tmp_path, trace, optimizer, mem):
+    traces, names, _ = synthetic_traces(8, WINDOW+INTERVAL, **TRACES[trace])
+    ci, ci_max, _, ci_avg = carbon_intensity
+    mem_old, mem_new = mem if mem is not None else (512, 512)
+    random.seed(0)
+    np.random.seed(0)
+    run_optimizer(optimizer, traces, names, [utils.read_func_mem_size(name) for name in names], ci, ci_max, ci_avg,
+                  "US-CAL", INTERVAL, mem_old, mem_new, SERVER_PAIR, list(range(31)), 0.5, WINDOW, 15,
+                  result_dir=str(tmp_path), quiet=True)
+    invocations, sum_st, sum_carbon = result_store.totals(str(tmp_path))
+    expected = EXPECTED[(trace, optimizer, mem)]
+    assert invocations == expected[0]
+    assert sum_st == pytest.approx(expected[1], rel=1e-9)
+    assert sum_carbon == pytest.approx(expected[2], rel=1e-9)
@@ -0,0 +1,87 @@
+import itertools
+import numpy as np
+import pytest
+import packer
+
+
+def brute_force(capacity, sizes, quantities, values):
+    #best value over every vector of counts
+    best = 0.0
+    for counts in itertools.product(*[range(int(q)+1) for q in quantities]):
+        counts = np.array(counts)
+        if counts @ sizes <= capacity:
+            best = max(best, float(counts @ values))
+    return best
+
+
+def instances(seed=0, n=30):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        items = int(rng.integers(1, 5))
+        sizes = rng.integers(1, 10, size=items)
+        quantities = rng.integers(1, 4, size=items)
+        values = rng.uniform(0.1, 5.0, size=items).round(3)
+        capacity = int(rng.integers(1, int(sizes @ quantities)+1))
+        yield capacity, sizes, quantities, values
+
+
+def check(counts, capacity, sizes, quantities):
+    assert np.all(counts >= 0) and np.all(counts <= quantities)
+    assert counts @ sizes <= capacity
+
+
+@pytest.mark.parametrize("capacity,sizes,quantities,values", list(instances()))
+def test_dp_is_optimal(capacity, sizes, quantities, values):
+    counts = packer.dp(capacity, sizes, quantities, values, grid=1)
+    check(counts, capacity, sizes, quantities)
+    assert float(counts @ values) == pytest.approx(brute_force(capacity, sizes, quantities, values))
+
+
+@pytest.mark.parametrize("capacity,sizes,quantities,values", list(instances(seed=1)))
+def test_fptas_within_eps(capacity, sizes, quantities, values):
+    eps = 0.1
+    counts = packer.fptas(capacity, sizes, quantities, values, eps, max_cells=1<<20)
+    check(counts, capacity, sizes, quantities)
+    assert float(counts @ values) >= (1-eps)*brute_force(capacity, sizes, quantities, values) - 1e-9
+
+
+def test_dp_grid_rounds_sizes_up():
+    #sizes rounded up to the grid never overfill the capacity
+    sizes, quantities, values = np.array([3, 5]), np.array([2, 2]), np.array([1.0, 2.0])
+    counts = packer.dp(10, sizes, quantities, values, grid=4)
+    check(counts, 10, sizes, quantities)
+
+
+def test_fptas_fills_profit_zero_chunks():
+    #a chunk scaled to no profit still takes the room that is left
+    sizes, quantities, values = np.array([5, 1]), np.array([1, 1]), np.array([100.0, 1e-9])
+    counts = packer.fptas(6, sizes, quantities, values, 0.1, max_cells=1<<20)
+    assert counts.tolist() == [1, 1]
+
+
+def test_fptas_table_is_bounded():
+    #many chunks: the table of every chunk together stays within max_cells
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(1, 1000, size=400)
+    quantities = rng.integers(1, 31, size=400)
+    values = rng.uniform(0.1, 5.0, size=400)
+    capacity = int(sizes @ quantities)//4
+    counts = packer.fptas(capacity, sizes, quantities, values, 0.05, max_cells=1<<16)
+    check(counts, capacity, sizes, quantities)
+
+
+@pytest.mark.parametrize("mode", ["dp", "fptas", "auto"])
+def test_pack_not_worse_than_greedy(mode):
+    rng = np.random.default_rng(2)
+    sizes = rng.uniform(0.01, 0.3, size=20)
+    quantities = rng.integers(1, 5, size=20)
+    values = rng.uniform(0.1, 5.0, size=20)
+    order = np.argsort(-values/sizes, kind="stable")
+    greedy = packer.Packer("greedy")
+    other = packer.Packer(mode)
+    capacity = float(sizes @ quantities)/3
+    base = greedy.pack(capacity, sizes, quantities, values, order)
+    counts = other.pack(capacity, sizes, quantities, values, order)
+    assert counts @ values >= base @ values
+    assert np.all(counts <= quantities)
+    assert other.fits(capacity, [sum(packer.mem_units(size)*int(c) for size, c in zip(sizes, counts))])[0]
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+import utils
+from optimizers import perf_opt
+
+WINDOW = 20
+INTERVAL = 60
+
+
+def test_single_invocation_trace_uses_its_own_values(tmp_path):
+    #the original loop charged a trace with one invocation minute with the
+    #warm st/carbon of the previous trace, each trace now has its own
+    ci, _, _, _ = utils.load_carbon_intensity("US-CAL", 800, WINDOW+INTERVAL)
+    traces = np.zeros((2, WINDOW+INTERVAL), dtype=np.uint16)
+    traces[0, [WINDOW+1, WINDOW+5, WINDOW+9]] = [2, 1, 3]
+    traces[1, WINDOW+30] = 4
+    names = ["dna", "video"]
+    server_pair = ['i3','m5zn']
+    optimizer = perf_opt.perf_opt(traces, names, server_pair, ci, WINDOW, INTERVAL, str(tmp_path))
+    minutes, counts, st, carbon, st_sum, carbon_sum, sum1 = optimizer.optimize_function(1)
+    st_warm = utils.get_st("video", server_pair[1])[1]
+    warm_carbon = utils.compute_exe("video", server_pair, ci[WINDOW+30])[1][1]
+    assert minutes.tolist() == [WINDOW+30] and counts.tolist() == [4]
+    assert st.tolist() == pytest.approx([st_warm])
+    assert carbon.tolist() == pytest.approx([warm_carbon])
+    assert st_sum == pytest.approx(4*st_warm)
+    assert carbon_sum == pytest.approx(4*warm_carbon)
+    #the last invocation is not counted
+    assert sum1 == 0
+    assert st_warm != utils.get_st("dna", server_pair[1])[1]
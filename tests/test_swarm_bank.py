@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import pytest
+import utils
+from pso import PSO
+from swarm_bank import SwarmBank
+
+SERVER_PAIR = ['i3','m5zn']
+KAT_TIME = list(range(31))
+NAMES = ["dna", "video", "pagerank-1000k", "dna"]
+
+
+def steps(n=12, seed=0):
+    #the invoked functions, ci and interval windows of every step, drawn
+    #from their own generator so that the seeded streams are left alone
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        invoked = np.flatnonzero(rng.random(len(NAMES)) < 0.7)
+        ci = float(rng.uniform(50, 400))
+        intervals = [rng.integers(0, 25, size=rng.integers(0, 6)).tolist() for _ in invoked]
+        yield invoked, ci, intervals
+
+
+@pytest.mark.parametrize("size", [4, 5])
+def test_matches_pso_reference(size):
+    #pso.PSO is the one-swarm-per-function reference of SwarmBank
+    _, _, _, ci_avg = utils.load_carbon_intensity("US-CAL", 800, 60)
+    random.seed(0)
+    np.random.seed(0)
+    expected = []
+    swarms = {}
+    for invoked, ci, intervals in steps():
+        for f, interval in zip(invoked, intervals):
+            if f not in swarms:
+                swarms[f] = PSO([size, KAT_TIME, 0.5], SERVER_PAIR, NAMES[f], ci_avg, ci, interval)
+            expected.append(swarms[f].main(ci, interval)[0].copy())
+
+    random.seed(0)
+    np.random.seed(0)
+    bank = SwarmBank(NAMES, SERVER_PAIR, KAT_TIME, 0.5, ci_avg, size)
+    kat = bank.kat_grid
+    decisions = []
+    for invoked, ci, intervals in steps():
+        cold = np.array([[sum(i > k for i in interval) for k in kat] for interval in intervals]).reshape(len(invoked), len(kat))
+        n_interval = np.array([len(interval) for interval in intervals], dtype=int)
+        decisions.extend(bank.step(invoked, ci, cold, n_interval))
+    assert len(decisions) == len(expected)
+    assert np.array_equal(np.array(decisions), np.array(expected).reshape(-1, 2))
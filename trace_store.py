@@ -0,0 +1,149 @@
+from pathlib import Path
+import json
+import os
+import zipfile
+import numpy as np
+import fire
+
+ROOT = Path(__file__).parents[0]
+TRACE_DIR = ROOT / "selected_trace"
+TRACE_ZIP = ROOT / "selected_trace.zip"
+# converted traces: (functions x minutes) invocation counts + name index
+TRACE_NPY = ROOT / "selected_trace.npy"
+TRACE_INDEX = ROOT / "selected_trace_index.json"
+
+
+def _parse(content):
+    return np.array(content.split(), dtype=np.uint32)
+
+
+def default_source():
+    #the selected_trace directory, or selected_trace.zip when the directory is absent
+    return TRACE_DIR if TRACE_DIR.is_dir() else TRACE_ZIP
+
+
+def source_stamp(source):
+    '''
+    path, mtime and size of the text traces (of the .txt files of a
+    directory), the converted traces are rebuilt when they change
+    '''
+    source = Path(source).resolve()
+    if source.is_dir():
+        files = [entry.stat() for entry in os.scandir(source) if entry.name.endswith('.txt')]
+        mtime = max((stat.st_mtime for stat in files), default=source.stat().st_mtime)
+        size = sum(stat.st_size for stat in files)
+    else:
+        stat = source.stat()
+        mtime, size = stat.st_mtime, stat.st_size
+    return {"path": str(source), "mtime": mtime, "size": size}
+
+
+def read_raw_traces(source=None):
+    '''
+    read the text traces from the selected_trace directory, or straight from
+    selected_trace.zip when the directory is absent
+    returns a list of count arrays and the original function names (file names)
+    '''
+    source = Path(source) if source is not None else default_source()
+    traces = []
+    original_function_names = []
+    if source.is_dir():
+        for file in os.listdir(source):
+            if file.endswith('.txt'):
+                original_function_names.append(file.split('.txt')[0])
+                with open(os.path.join(source, file), 'r') as f:
+                    traces.append(_parse(f.read()))
+    else:
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.namelist():
+                name = member.split('/')[-1]
+                if member.startswith('__MACOSX') or not name.endswith('.txt'):
+                    continue
+                original_function_names.append(name.split('.txt')[0])
+                traces.append(_parse(archive.read(member).decode()))
+    return traces, original_function_names
+
+
+def convert_traces(source=None, npy_path=TRACE_NPY, index_path=TRACE_INDEX):
+    '''
+    one time conversion of the text traces into a single (functions x minutes)
+    uint16/uint32 .npy file and a json name index, with the stamp of the source
+    '''
+    source = Path(source) if source is not None else default_source()
+    traces, original_function_names = read_raw_traces(source)
+    data = np.stack(traces)
+    dtype = np.uint16 if data.max(initial=0) <= np.iinfo(np.uint16).max else np.uint32
+    data = data.astype(dtype)
+    np.save(npy_path, data)
+    index = {"original_function_names": original_function_names,
+             "function_names": [name.split('*')[0] for name in original_function_names],
+             "source": source_stamp(source)}
+    with open(index_path, "w") as file:
+        json.dump(index, file, indent=4)
+    return data, index
+
+
+def _current(index_path, source):
+    #whether the converted traces at index_path are of source as it is now
+    if not Path(index_path).exists():
+        return False
+    if source is None or not Path(source).exists():
+        #nothing to rebuild them from
+        return True
+    with open(index_path, 'r') as file:
+        return json.load(file).get("source") == source_stamp(source)
+
+
+def load_traces(npy_path=TRACE_NPY, index_path=TRACE_INDEX, mmap=True, source=""):
+    '''
+    memory-map the converted traces, converting them first if they are absent
+    or if source (by default the selected traces, None for a store without
+    text traces) changed since
+    returns traces (functions x minutes), function names, original function names
+    '''
+    source = default_source() if source == "" else source
+    if Path(npy_path).exists() and _current(index_path, source):
+        data = np.load(npy_path, mmap_mode='r' if mmap else None)
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+    else:
+        try:
+            data, index = convert_traces(source, npy_path=npy_path, index_path=index_path)
+        except OSError:
+            #read only checkout, keep the traces in memory
+            traces, original_function_names = read_raw_traces(source)
+            data = np.stack(traces)
+            index = {"original_function_names": original_function_names,
+                     "function_names": [name.split('*')[0] for name in original_function_names]}
+        else:
+            if mmap:
+                data = np.load(npy_path, mmap_mode='r')
+    return data, index["function_names"], index["original_function_names"]
+
+
+def invocation_totals(start, end, npy_path=TRACE_NPY, index_path=TRACE_INDEX):
+    '''
+    number of invocations of every function in the minutes [start, end),
+    cached in the trace index so that later reads do not scan the traces
+    '''
+    traces, _, _ = load_traces(npy_path, index_path)
+    key = f"{start}:{end}"
+    index = None
+    if Path(index_path).exists():
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+        if key in index.get("invocation_totals", {}):
+            return np.array(index["invocation_totals"][key], dtype=np.int64)
+    totals = np.asarray(traces[:, start:end]).sum(axis=1, dtype=np.int64)
+    if index is not None:
+        index.setdefault("invocation_totals", {})[key] = totals.tolist()
+        try:
+            with open(index_path, "w") as file:
+                json.dump(index, file, indent=4)
+        except OSError:
+            pass
+    return totals
+
+
+if __name__ == "__main__":
+    fire.Fire(convert_traces)
@@ -1,19 +1,18 @@
-from pathlib import Path
-import pandas as pd
-from glob import glob
 import json
 import os
 import csv
 import numpy as np
 import shutil
 import sys
+from profile_catalog import get_catalog
+from carbon_model import get_carbon_model
+from warm_pool import pool_mem, decision_mem, impact_scores, packed_pool
+import trace_store
+import ci_store
+import forecast
+import packer
 def read_func_mem_size(name):
-    app = {}
-    with open(f'{Path(__file__).parents[0]}/function_mem.csv', newline='', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            app[row[0]] = float(row[1])
-    return app[name]
+    return get_catalog().func_mem_size(name)
 
 def raw_to_average():
     app = {}
@@ -47,25 +46,14 @@ def raw_to_average():
                 json.dump(avg, f2, indent=4)
           
 def compute_exe_energy(app, server):
-    # load sevrer info
-    with open(f'{Path(__file__).parents[0]}/server_info.json', 'r') as file:
-        info = json.load(file)
-    for index,single_info in enumerate(info):
-        if single_info["name"] == server:
-            server_info = info[index]
-    with open(f'{Path(__file__).parents[0]}/data/avg_data/{app}_{server}.metal.json','r') as data_file:
-        server_data = json.load(data_file)[0]
+    catalog = get_catalog()
+    server_data = catalog.app_profile(app, server)
     cold_energy = server_data['cs_energy_cpu'] + server_data['cs_energy_dram'] + server_data['exe_energy_cpu'] + server_data['exe_energy_dram']
     warm_energy = server_data['exe_energy_cpu'] + server_data['exe_energy_dram']
     return cold_energy, warm_energy
             
 def compute_kat_energy(server,kat):
-    # load sevrer info
-    with open(f'{Path(__file__).parents[0]}/server_info.json', 'r') as file:
-        info = json.load(file)
-    for index,single_info in enumerate(info):
-        if single_info["name"] == server:
-            server_info = info[index]
+    server_info = get_catalog().server_info(server)
     oc_kat_dram = kat*server_info['dram_idle_energy']/10
     oc_kat_cpu = kat*server_info['cpu_idle_energy']/10
     return oc_kat_cpu+oc_kat_dram
@@ -74,20 +62,14 @@ def compute_kat_energy(server,kat):
 def compute_exe(app, server_pair,CI):
     old = server_pair[0]
     new = server_pair[1]
-    function_size = read_func_mem_size(app)
-    # load sevrer info
-    with open(f'{Path(__file__).parents[0]}/server_info.json', 'r') as file:
-        server_info = json.load(file)
-    for index,single_info in enumerate(server_info):
-        if single_info["name"] == old:
-            old_info = server_info[index]
-        if single_info["name"] == new:
-            new_info = server_info[index]
-    # read app data
-    with open(f'{Path(__file__).parents[0]}/data/avg_data/{app}_{old}.metal.json','r') as old_data_file:
-        old_data = json.load(old_data_file)[0]
-    with open(f'{Path(__file__).parents[0]}/data/avg_data/{app}_{new}.metal.json','r') as new_data_file:
-        new_data = json.load(new_data_file)[0]
+    catalog = get_catalog()
+    function_size = catalog.func_mem_size(app)
+    # sevrer info
+    old_info = catalog.server_info(old)
+    new_info = catalog.server_info(new)
+    # app data
+    old_data = catalog.app_profile(app, old)
+    new_data = catalog.app_profile(app, new)
     old_q = function_size / old_info["mem"]
     new_q = function_size / new_info["mem"]
     
@@ -143,17 +125,10 @@ def compute_exe(app, server_pair,CI):
 
 def compute_kat(app, server, kat, CI):
     #kat is min
-    function_size = read_func_mem_size(app)
-    # load sevrer info
-    with open(f'{Path(__file__).parents[0]}/server_info.json', 'r') as file:
-        info = json.load(file)
-    for index,single_info in enumerate(info):
-        if single_info["name"] == server:
-            server_info = info[index]
-    
-    # read app data
-    with open(f'{Path(__file__).parents[0]}/data/avg_data/{app}_{server}.metal.json','r') as data_file:
-        server_data = json.load(data_file)[0]
+    catalog = get_catalog()
+    function_size = catalog.func_mem_size(app)
+    # sevrer info
+    server_info = catalog.server_info(server)
     q = function_size / server_info["mem"]
     ec_kat_dram = (kat*1000/(4*12*30*24*60))*q*server_info['ec_ram']
     oc_kat_dram = kat*q*CI*server_info['dram_idle_energy']/1000/3600/10
@@ -163,8 +138,7 @@ def compute_kat(app, server, kat, CI):
     
 
 def get_st(app, server):
-    with open(f'{Path(__file__).parents[0]}/data/avg_data/{app}_{server}.metal.json','r') as data_file:
-        data = json.load(data_file)[0]
+    data = get_catalog().app_profile(app, server)
     return data['cs'] + data['exe'], data['exe']
 
 
@@ -173,19 +147,12 @@ def load_carbon_intensity(
     start_hour: int=800,
     interval: int=12*24*60,
 ):
-    region_data = glob(f"{Path(__file__).parents[0]}/carbon_intensity/{region}*_2023_hourly.csv")[0]
+    #per minute carbon intensity of interval minutes from start_hour, parsed once per region
+    return ci_store.load(region, start_hour, interval)
 
-    df = pd.read_csv(region_data)
-    data = df["Carbon Intensity gCO₂eq/kWh (direct)"].values[start_hour:start_hour+int(12*24*60/60)]
-    ci_avg = df["Carbon Intensity gCO₂eq/kWh (direct)"].mean()
-    ci_max = df["Carbon Intensity gCO₂eq/kWh (direct)"].max()
-    ci_min = df["Carbon Intensity gCO₂eq/kWh (direct)"].min()
-    data_list = data.tolist()
-    ci = []
-    for item in data_list:
-        for _ in range(60):
-            ci.append(item)
-    return ci,ci_max,ci_min,ci_avg
+def make_forecaster(name, region, start_hour):
+    #forecaster of the hourly ci of region, minute 0 is start_hour
+    return forecast.make(name, ci_store.get_region(region).hourly, start_hour)
 
 def function_mapping(duration_list, app_list):
     duration_list_norm =  (duration_list- np.min(duration_list)) / ( np.max(duration_list) - np.min(duration_list))
@@ -212,21 +179,8 @@ def copy_and_rename_file(source_file, destination_directory, new_filename):
         print("error{e}")
 
 def read_selected_traces():
-    directory_path = f"{Path(__file__).parents[0]}/selected_trace"
-    traces = []
-    function_names = []
-    path_list = []
-    original_function_names = []
-    for file in os.listdir(directory_path):
-        if file.endswith('.txt'):
-            original_function_names.append(file.split('.txt')[0])
-            function_names.append(file.split('*')[0])
-            path_list.append( os.path.join(directory_path, file))
-    for file in path_list:
-        with open(file, 'r') as f:
-            file_content = [line.strip() for line in f.readlines()]
-            traces.append(file_content)
-    return traces,function_names,original_function_names
+    # (functions x minutes) counts, memory-mapped from the converted trace store
+    return trace_store.load_traces()
 def prob_cold(cur_interval, kat):
         
     if len(cur_interval)==0:
@@ -243,102 +197,54 @@ def prob_cold(cur_interval, kat):
                 cold+=1
         return cold/(cold+warm), warm/(cold+warm)
 
-def mem_check(mem_new,mem_old, old_decision,new_decision,function_mem_trace,new_warm_pool,old_warm_pool):
-    cost_old_mem = 0
-    cost_new_mem = 0
-    
-    for key, value in old_decision.items():
-        cost_old_mem+=function_mem_trace[key]*int(value['num'])
-    for key, value in old_warm_pool.items():
-        cost_old_mem+=function_mem_trace[key]*int(value['num'])
-    for key, value in new_decision.items():
-        cost_new_mem+=function_mem_trace[key]*int(value['num'])
-    for key, value in new_warm_pool.items():
-        cost_new_mem+=function_mem_trace[key]*int(value['num'])
-    if mem_new>=cost_new_mem and mem_old>=cost_old_mem:
-        # both of them are fine
-        return 0
-    elif mem_new>=cost_new_mem and mem_old<cost_old_mem:
-        #change old
-        return 1
-    elif mem_new<cost_new_mem and mem_old>=cost_old_mem:
-        #change new
-        return 2
-    elif mem_new<cost_new_mem and mem_old<cost_old_mem:
-        #change both
-        return 3
-    else:
-        sys.exit("error in mem check")
-    
-def adjust_pool(mem,function_mem_trace,pool,decision_pool,interval_list,old_or_new,function_names,server_pair,ci,cur_time,window_size,result_carbon):
-    
+def mem_check(mem_limits, decisions, warm_pools, function_mem_trace, pool_packer=None):
+    '''
+    servers whose warm pool and new keep alive decisions exceed their memory
+    limit, the pools keep their memory, only the decisions are summed
+    '''
+    pool_packer = pool_packer if pool_packer is not None else packer.Packer()
+    cost_mem = [pool_mem(pool,function_mem_trace) + decision_mem(decision,function_mem_trace) for decision, pool in zip(decisions, warm_pools)]
+    return [not fits for fits in pool_packer.fits(mem_limits, cost_mem).tolist()]
+
+def charge_pool(pool,old_or_new,function_names,server_pair,ci,cur_time,result_carbon):
+    #keep alive carbon of the pool until cur_time
     kat_carbon = 0
-    #compute the kat carbon for the pool
     for key, value in pool.items():
         which_fun = key
         invoke_time = value['invoke_time']
-        
         assert(int(result_carbon[which_fun][invoke_time]['num']) >= int(value['num']))
         sig_kc = compute_kat(function_names[key],server_pair[old_or_new],int(cur_time)-int(value['start_time']),ci[int(value['start_time'])])*int(value['num'])
         result_carbon[which_fun][invoke_time]["carbon"]+=sig_kc
         kat_carbon+=sig_kc
+    return kat_carbon
 
-    new_pool = {}
-    limit = mem
-    function_index = []
-    function_invocation = []
-    function_ka_start = []
-    function_ka_end = []
-    function_mem = []
-    impact_score = []
-    function_invoke_time=[]
-    for key, value in pool.items():
-        function_index.append(key)
-        function_invocation.append(value['num'])
-        function_ka_start.append(value['start_time'])
-        function_ka_end.append(value['end_time'])
-        function_invoke_time.append(value['invoke_time'])
-    for key, value in decision_pool.items():
-        function_index.append(key)
-        function_invocation.append(value['num'])
-        function_ka_start.append(value['start_time'])
-        function_ka_end.append(value['end_time'])
-        function_invoke_time.append(value['invoke_time'])
-    for index in function_index:
-        function_mem.append(function_mem_trace[index])
-        
-    for i in range(len(function_index)):
-        index = function_index[i]
-        cold_st = get_st(function_names[index],server_pair[old_or_new])[0]
-        warm_st = get_st(function_names[index],server_pair[old_or_new])[1]
-        a,b = compute_exe(function_names[index], server_pair, ci[cur_time])
-        cold_carbon = a[old_or_new]
-        warm_carbon = b[old_or_new]
-        
-        p_cold, p_warm = prob_cold(interval_list[index][cur_time-window_size], function_ka_end[i]-cur_time)
-        p_st = p_cold*cold_st+p_warm*warm_st
-        p_carbon = p_cold*cold_carbon+p_warm*warm_carbon
-        st_dif = (cold_st - p_st )/cold_st
-        carbon_dif = (max(cold_carbon,warm_carbon)-p_carbon )/max(cold_carbon,warm_carbon)
-        impact_score.append((0.5*st_dif+0.5*carbon_dif)/function_mem[i])
-    impact_score = np.array(impact_score)
-    sort_index = impact_score.argsort()[::-1]
-    sort_index_list = sort_index.tolist()
-    # print(sort_index_list)
-    index_normal = [i for i in range(len(function_index))]
+def repack_pool(mem,function_mem_trace,candidates,tracker,old_or_new,function_names,server_pair,ci,cur_time,pool_packer=None):
+    '''
+    the units of the candidates (function, entry) that fit in mem, by
+    decreasing impact score (or the packer.Packer mode): score, pack, then apply
+    '''
+    function_index = [key for key, _ in candidates]
+    function_invocation = [value['num'] for _, value in candidates]
+    function_ka_end = [value['end_time'] for _, value in candidates]
+    function_mem = [function_mem_trace[index] for index in function_index]
+    model = get_carbon_model(servers=server_pair)
+    apps = [model.app_index[function_names[index]] for index in function_index]
+    impact_score = impact_scores(function_index,function_ka_end,old_or_new,model,apps,ci[cur_time],cur_time,tracker,function_mem)
+    sort_index_list = impact_score.argsort()[::-1].tolist()
+    pool_packer = pool_packer if pool_packer is not None else packer.Packer()
+    #the impact score is per GB, a unit is worth its score times its memory
+    counts = pool_packer.pack(mem, function_mem, function_invocation, impact_score*np.asarray(function_mem), sort_index_list)
+    return packed_pool(candidates, counts, sort_index_list, cur_time)
+
+def adjust_pool(mem,function_mem_trace,pool,decision_pool,tracker,old_or_new,function_names,server_pair,ci,cur_time,window_size,result_carbon,pool_packer=None):
     
-    _, pool_list = pack_items(limit, function_mem, function_invocation, index_normal, sort_index_list)
-    for index in pool_list:
-        if function_index[index] in new_pool:
-            new_pool[function_index[index]]['num']+=1
-        else:
-            new_pool[function_index[index]] =  {"num":1,"start_time":cur_time, "end_time":function_ka_end[index],"invoke_time":function_invoke_time[index]}
+    #compute the kat carbon for the pool
+    kat_carbon = charge_pool(pool,old_or_new,function_names,server_pair,ci,cur_time,result_carbon)
+    candidates = list(pool.items()) + list(decision_pool.items())
+    new_pool = repack_pool(mem,function_mem_trace,candidates,tracker,old_or_new,function_names,server_pair,ci,cur_time,pool_packer)
 
     #get all discarded functions
-    combined_dict = {**pool, **decision_pool}
-    
-    discarded_dict = {key: value for key, value in combined_dict.items() if key not in new_pool}
-    assert len(set(discarded_dict.keys()).intersection(new_pool.keys())) == 0
+    discarded_dict = {key: value for key, value in candidates if key not in new_pool}
     for key, value in discarded_dict.items():
         if discarded_dict[key]['start_time']< cur_time:
             discarded_dict[key]['start_time'] = cur_time
@@ -349,95 +255,18 @@ def adjust_pool(mem,function_mem_trace,pool,decision_pool,interval_list,old_or_n
     return new_pool,discarded_dict,kat_carbon,result_carbon
 
 
-def pack_items(box_capacity, sizes, quantities, item_indices, index_list):
-    remaining_space = box_capacity
-    packed_items = []
-
-    for index in index_list:
-        item_index = int(item_indices[index])
-        item_size = float(sizes[item_index])
-        item_quantity = int(quantities[item_index])
-        while item_quantity > 0 and remaining_space >= item_size:
-            packed_items.append(index)
-            remaining_space -= item_size
-            item_quantity -= 1
-
-    return remaining_space, packed_items
-
-def add_discard_pool(original_pool, discard_pool,mem,function_mem_trace,function_names,old_or_new,interval_list,server_pair,cur_time,window_size,ci,result_carbon):
-    limit = mem
+def add_discard_pool(original_pool, discard_pool,mem,function_mem_trace,function_names,old_or_new,tracker,server_pair,cur_time,window_size,ci,result_carbon,pool_packer=None):
     assert len(set(original_pool.keys()).intersection(discard_pool.keys())) == 0
     
-    cost_mem = 0
-    for key, value in original_pool.items():
-        cost_mem+=function_mem_trace[key]*int(value['num'])
-    for key, value in discard_pool.items():
-        cost_mem+=function_mem_trace[key]*int(value['num'])
-    if cost_mem>limit:
+    pool_packer = pool_packer if pool_packer is not None else packer.Packer()
+    cost_mem = pool_mem(original_pool,function_mem_trace) + decision_mem(discard_pool,function_mem_trace)
+    if not pool_packer.fits(mem, cost_mem):
         #out of memory
-        
-        kat_carbon = 0
         #compute the kat carbon for the pool
-        for key, value in original_pool.items():
-            which_fun = key
-            invoke_time = value['invoke_time']
-            assert(int(result_carbon[which_fun][invoke_time]['num']) >= int(value['num']))
-            sig_kc = compute_kat(function_names[key],server_pair[old_or_new],cur_time-int(value['start_time']),ci[int(value['start_time'])])*int(value['num'])
-            result_carbon[which_fun][invoke_time]["carbon"]+=sig_kc
-            kat_carbon+=sig_kc
-        
-        
-        new_pool = {}
-        function_index = []
-        function_invocation = []
-        function_ka_start = []
-        function_ka_end = []
-        function_mem = []
-        impact_score = []
-        function_invoke_time=[]
-        for key, value in original_pool.items():
-            function_index.append(key)
-            function_invocation.append(value['num'])
-            function_ka_start.append(value['start_time'])
-            function_ka_end.append(value['end_time'])
-            function_invoke_time.append(value['invoke_time'])
-        for key, value in discard_pool.items():
-            function_index.append(key)
-            function_invocation.append(value['num'])
-            function_ka_start.append(value['start_time'])
-            function_ka_end.append(value['end_time'])
-            function_invoke_time.append(value['invoke_time'])
-        for index in function_index:
-            function_mem.append(function_mem_trace[index])
-        for i in range(len(function_index)):
-            index = function_index[i]
-            cold_st = get_st(function_names[index],server_pair[old_or_new])[0]
-            warm_st = get_st(function_names[index],server_pair[old_or_new])[1]
-            a,b = compute_exe(function_names[index], server_pair, ci[cur_time])
-            cold_carbon = a[old_or_new]
-            warm_carbon = b[old_or_new]
-            
-            p_cold, p_warm = prob_cold(interval_list[index][cur_time-window_size], function_ka_end[i]-cur_time)
-            p_st = p_cold*cold_st+p_warm*warm_st
-            p_carbon = p_cold*cold_carbon+p_warm*warm_carbon
-            st_dif = (cold_st - p_st )/cold_st
-            carbon_dif = (max(cold_carbon,warm_carbon)-p_carbon )/max(cold_carbon,warm_carbon)
-            impact_score.append((0.5*st_dif+0.5*carbon_dif)/function_mem[i])
-        impact_score = np.array(impact_score)
-        sort_index = impact_score.argsort()[::-1]
-        sort_index_list = sort_index.tolist()
-        # print(sort_index_list)
-        index_normal = [i for i in range(len(function_index))]
-        
-        _, pool_list = pack_items(limit, function_mem, function_invocation, index_normal, sort_index_list)
-        for index in pool_list:
-            if function_index[index] in new_pool:
-                new_pool[function_index[index]]['num']+=1
-            else:
-                new_pool[function_index[index]] =  {"num":1,"start_time":cur_time, "end_time":function_ka_end[index],"invoke_time":function_invoke_time[index]}
-        combined_dict = {**original_pool, **discard_pool}
-    
-        discarded_dict = {key: value for key, value in combined_dict.items() if key not in new_pool}
+        kat_carbon = charge_pool(original_pool,old_or_new,function_names,server_pair,ci,cur_time,result_carbon)
+        candidates = list(original_pool.items()) + list(discard_pool.items())
+        new_pool = repack_pool(mem,function_mem_trace,candidates,tracker,old_or_new,function_names,server_pair,ci,cur_time,pool_packer)
+        discarded_dict = {key: value for key, value in candidates if key not in new_pool}
         
         return new_pool,kat_carbon,discarded_dict,result_carbon
     else:
@@ -445,6 +274,3 @@ def add_discard_pool(original_pool, discard_pool,mem,function_mem_trace,function
         #combine all
         combined_dict = {**original_pool, **discard_pool}
         return combined_dict,0,0,result_carbon
-
-    
-    
\ No newline at end of file
@@ -0,0 +1,138 @@
+import heapq
+import numpy as np
+
+# memory is accounted in integer nano-GB so that the running totals are exact
+MEM_UNIT = 10**9
+
+
+def mem_units(mem):
+    return int(round(mem*MEM_UNIT))
+
+
+class WarmPool:
+    '''
+    Keep-alive pool of one server, a mapping function index ->
+    {"num", "start_time", "end_time", "invoke_time"} (insertion ordered, like
+    the dict it replaces) with
+    - a min-heap of end times, entries replaced or removed are skipped lazily,
+      so finding the expired functions costs O(log n) each
+    - the running memory of the pool in integer nano-GB, so checking a
+      memory limit is O(1)
+    '''
+    def __init__(self, function_mem, entries=None):
+        self.function_mem = [mem_units(mem) for mem in function_mem]
+        self.entries = {}
+        self.heap = []
+        self.mem = 0
+        if entries:
+            self.reset(entries)
+
+    def __contains__(self, function):
+        return function in self.entries
+
+    def __getitem__(self, function):
+        return self.entries[function]
+
+    def __setitem__(self, function, value):
+        if function in self.entries:
+            self.mem -= self.function_mem[function]*int(self.entries[function]["num"])
+        self.entries[function] = value
+        self.mem += self.function_mem[function]*int(value["num"])
+        heapq.heappush(self.heap, (int(value["end_time"]), function))
+
+    def __delitem__(self, function):
+        value = self.entries.pop(function)
+        self.mem -= self.function_mem[function]*int(value["num"])
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        return self.entries.items()
+
+    def keys(self):
+        return self.entries.keys()
+
+    def values(self):
+        return self.entries.values()
+
+    def reset(self, entries):
+        #replace the content of the pool, keeping the order of entries
+        self.entries = dict(entries)
+        self.mem = sum(self.function_mem[f]*int(value["num"]) for f, value in self.entries.items())
+        self.heap = [(int(value["end_time"]), f) for f, value in self.entries.items()]
+        heapq.heapify(self.heap)
+
+    def _valid(self, end_time, function):
+        return function in self.entries and int(self.entries[function]["end_time"]) == end_time
+
+    def next_expiry(self):
+        #earliest end time in the pool, None when it is empty
+        while self.heap and not self._valid(*self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_expired(self, minute):
+        '''
+        functions whose keep alive ends at or before minute; they leave the
+        heap, the caller removes them from the pool
+        '''
+        expired = set()
+        while self.next_expiry() is not None and self.heap[0][0] <= minute:
+            expired.add(heapq.heappop(self.heap)[1])
+        return sorted(expired)
+
+
+def decision_mem(decision, function_mem_trace):
+    #memory (nano-GB) of keep alive decisions
+    return sum(mem_units(function_mem_trace[f])*int(value["num"]) for f, value in decision.items())
+
+
+def pool_mem(pool, function_mem_trace):
+    return pool.mem if isinstance(pool, WarmPool) else decision_mem(pool, function_mem_trace)
+
+
+def impact_scores(functions, ka_end, old_or_new, model, apps, ci, cur_time, tracker, function_mem):
+    '''
+    score stage of the pool adjustment: expected service time and carbon
+    saved per GB by keeping each candidate warm until its end time,
+    computed for all candidates at once
+    '''
+    functions = np.asarray(functions, dtype=int)
+    apps = np.asarray(apps, dtype=int)
+    cold_st = model.cold_st[apps, old_or_new]
+    warm_st = model.warm_st[apps, old_or_new]
+    cold_carbon, warm_carbon = model.exe(ci)
+    cold_carbon = cold_carbon[apps, old_or_new, 0]
+    warm_carbon = warm_carbon[apps, old_or_new, 0]
+    kat = np.clip(np.asarray(ka_end, dtype=int)-cur_time, 0, tracker.window_size-1)
+    n = tracker.n_interval[functions]
+    cold = tracker.cold[functions, kat]
+    p_cold = np.where(n > 0, cold/np.maximum(n, 1), 0.5)
+    p_warm = np.where(n > 0, (n-cold)/np.maximum(n, 1), 0.5)
+    p_st = p_cold*cold_st+p_warm*warm_st
+    p_carbon = p_cold*cold_carbon+p_warm*warm_carbon
+    st_dif = (cold_st - p_st)/cold_st
+    max_carbon = np.maximum(cold_carbon, warm_carbon)
+    carbon_dif = (max_carbon-p_carbon)/max_carbon
+    return (0.5*st_dif+0.5*carbon_dif)/np.asarray(function_mem, dtype=float)
+
+
+def packed_pool(candidates, counts, order, cur_time):
+    '''
+    apply stage: the pool of the packed units of the candidates (counts),
+    in packing order, restarting their keep alive at cur_time
+    '''
+    new_pool = {}
+    for index in order:
+        if counts[index] == 0:
+            continue
+        function, value = candidates[index]
+        if function in new_pool:
+            new_pool[function]['num'] += int(counts[index])
+        else:
+            new_pool[function] = {"num":int(counts[index]), "start_time":cur_time, "end_time":value['end_time'], "invoke_time":value['invoke_time']}
+    return new_pool